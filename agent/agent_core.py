@@ -1,14 +1,77 @@
-from agent.prompt import build_prompt
-from llm.model import LLM
+from agent.prompt import build_prompt, build_followup_prompt
+from agent.profiling import SessionProfile, TurnProfile, ollama_timings
+from agent.imports import merge_imports
+from agent.multi_file import (
+    MAX_PARALLEL_TARGETS,
+    apply_writes,
+    combined_diff,
+    describe,
+    find_paths,
+    plan_write,
+    scoped_requests,
+    write_targets,
+)
+from agent.workspace import active_workspace, use_workspace
+from tracing import set_attributes, span
+from llm.router import ModelRouter
 from rag.retriever import retrieve_context
 from agent.file_tools import (
     read_file,
     write_file,
     append_file,
+    update_file,
+    file_lock,
+    file_turn,
     FileToolError
 )
+from concurrent.futures import ThreadPoolExecutor
 import re
 
+# ANSWER-mode files larger than this go into the prompt as a symbol
+# summary instead of full text (the CLI still shows the whole file)
+FULL_FILE_MAX_CHARS = 6000
+
+# ACTION responses are cut off once the code is complete and this much
+# explanation has followed it (only the code and a short note are used)
+ACTION_EXPLANATION_BUDGET_CHARS = 400
+
+_CODE_BLOCK = re.compile(r'```(?:python)?\s*\n(.*?)\n```', re.DOTALL)
+_CODE_START = ("class ", "def ", "from ", "import ")
+_EXPLANATION_START = ("Explanation:", "In order to", "Note:", "This")
+_EXPLANATION_START_LOWER = ("you can", "the above", "in this")
+_MARKER_CHARS = max(len(m) for m in _EXPLANATION_START + _EXPLANATION_START_LOWER)
+
+_SYMBOL_LOOKUP = [
+    re.compile(r"\b(?:which|what)\s+(?:app|file|module)\s+(?:defines|contains|has)\s+(?:the\s+)?(\w+)", re.I),
+    re.compile(r"\bwhere\s+is\s+(?:the\s+)?(\w+)\s+(?:defined|declared)", re.I),
+]
+
+
+class AgentTurn:
+    """
+    State of one request between AgentCore.prepare and AgentCore.complete
+    """
+
+    def __init__(self, user_input: str):
+        self.user_input = user_input
+        self.workspace = None  # name of the workspace the turn runs in
+        self.mode = None
+        self.path = None
+        self.targets = []  # multi-file ACTION: dicts with 'path', 'request', 'prompt'
+        self.skipped_templates = []  # templates left out of a multi-file ACTION
+        self.file_content = None
+        self.context = None
+        self.sources = []
+        self.symbol_summary = None
+        self.memory = None
+        self.prompt = None
+        self.followup_prompt = None  # used when continuing an Ollama session
+        self.on_token = None  # optional callback for streamed response text
+        self.error = None  # set when the request fails before generation
+        self.failed = False  # set when the request did not succeed (LLM, code or file error)
+        self.direct_answer = None  # set when no LLM call is needed
+        self.profile = TurnProfile()
+
 
 class AgentCore:
     """
@@ -18,52 +81,206 @@ class AgentCore:
     - Full response prints to CLI
     """
 
-    def __init__(self):
-        self.llm = LLM()
+    def __init__(self, latency_budget: float | None = None, memory=None):
+        self.router = ModelRouter(latency_budget=latency_budget)
+        self.memory = memory
+        self.session_profile = SessionProfile()
+        self.last_profile = None
+        # Load the default workspace (and start indexing it) up front
+        active_workspace()
+
+    @property
+    def symbols(self):
+        """Symbol index of the active workspace"""
+        return active_workspace().symbols
+
+    def run(self, user_input: str, memory=None, on_token=None, workspace: str | None = None) -> str:
+        with span("agent.run", **{"agent.input_chars": len(user_input)}) as current:
+            turn = self.prepare(user_input, memory=memory, on_token=on_token, workspace=workspace)
+            output = self.complete(turn)
+            set_attributes(current, {
+                "agent.mode": turn.mode,
+                "agent.path": turn.path,
+                "agent.model": turn.profile.meta.get("model"),
+            })
+            return output
+
+    def prepare(self, user_input: str, memory=None, on_token=None, workspace: str | None = None) -> "AgentTurn":
+        """
+        Everything before the LLM call: mode detection, file read,
+        retrieval and prompt build. Split out so batch mode can prepare
+        upcoming requests while the LLM works on the current one.
+
+        `memory` (a ConversationMemory) defaults to the agent's own;
+        `on_token` receives the LLM response text as it streams in.
+        `workspace` names the workspace to work in (default: the
+        active one); complete() runs in the same workspace.
+        """
+        with use_workspace(workspace or active_workspace().name) as current:
+            with span("agent.prepare", **{"agent.workspace": current.name}):
+                turn = self._prepare(user_input, memory, on_token)
+                turn.workspace = current.name
+                return turn
+
+    def _prepare(self, user_input: str, memory, on_token) -> "AgentTurn":
+        turn = AgentTurn(user_input)
+        turn.memory = memory or self.memory
+        turn.on_token = on_token
+        profile = turn.profile
 
-    def run(self, user_input: str) -> str:
         # STEP 1: Detect mode and extract path FIRST
-        mode = self._detect_mode(user_input)
-        path = self._extract_path(user_input)
-        
-        # DEBUG: Show detected mode
-        print(f"\n[DEBUG] Detected mode: {mode}")
-        print(f"[DEBUG] Extracted path: {path}")
+        with profile.stage("mode_detection"):
+            turn.mode = self._detect_mode(user_input)
+            paths = find_paths(user_input)
+            turn.path = paths[0] if paths else None
+            if turn.mode == "ACTION" and paths:
+                # Only files the request asks to write to; others are
+                # just mentioned ("tests in tests.py for models.py")
+                targets = write_targets(user_input, paths) or paths[:1]
+                if len(targets) > 1:
+                    # Template responses are not Python code blocks, so
+                    # they would fail the whole scaffold
+                    code_targets = [p for p in targets if p.endswith(".py")]
+                    if code_targets:
+                        turn.skipped_templates = [p for p in targets if p not in code_targets]
+                        targets = code_targets
+                    else:
+                        targets = targets[:1]
+                turn.path = targets[0]
+                if len(targets) > 1:
+                    turn.targets = [
+                        {"path": path, "request": request}
+                        for path, request in scoped_requests(user_input, targets).items()
+                    ]
+        profile.meta["mode"] = turn.mode
+        profile.meta["path"] = ", ".join(t["path"] for t in turn.targets) if turn.targets else turn.path
+
+        # STEP 1b: Answer symbol lookups straight from the workspace index
+        with profile.stage("symbol_lookup"):
+            self.symbols.ensure_fresh()
+            turn.direct_answer = self._answer_from_index(user_input)
+        if turn.direct_answer:
+            return turn
 
         # STEP 2: If ANSWER MODE with file path, read the file content
-        file_content = None
-        if mode == "ANSWER" and path:
+        if turn.mode == "ANSWER" and turn.path:
             try:
-                from pathlib import Path
-                full_path = Path("D:/Final_Project_Folder/django_cli_agent/agent_test_project") / path
-                print(f"[DEBUG] Trying to read: {full_path}")
-                print(f"[DEBUG] File exists: {full_path.exists()}")
-                
-                file_content = read_file(path)
-                print(f"[DEBUG] File content read successfully: {len(file_content)} chars")
+                with file_turn(), profile.stage("file_read"):
+                    turn.file_content = read_file(turn.path)
             except FileToolError as e:
-                print(f"[DEBUG] FileToolError: {e}")
-                return f"❌ Cannot read file: {e}"
+                turn.error = f"❌ Cannot read file: {e}"
+                return turn
             except Exception as e:
-                print(f"[DEBUG] Unexpected error: {e}")
-                return f"❌ Error reading file: {e}"
+                turn.error = f"❌ Error reading file: {e}"
+                return turn
 
-        # STEP 3: Retrieve RAG context
+        # STEP 3: Retrieve RAG context (adaptive k; may be empty)
+        timings = {}
         try:
-            context, sources = retrieve_context(user_input, k=4)
+            turn.context, turn.sources = retrieve_context(
+                user_input, timings=timings, collections=active_workspace().collections()
+            )
         except Exception:
-            context, sources = None, []
-
-        # STEP 4: Build prompt with file content if available
-        prompt = build_prompt(
-            user_input=user_input, 
-            context=context,
-            file_content=file_content,
-            file_path=path
-        )
-        
-        # STEP 5: Generate LLM response
-        raw = self.llm.generate(prompt).strip()
+            turn.context, turn.sources = None, []
+        for name, seconds in timings.items():
+            profile.add(f"retrieval.{name}", seconds)
+
+        # STEP 4: Build prompt with file content (or, for big files, a
+        # compact symbol summary) and the relevant project symbols
+        if turn.targets:
+            with profile.stage("prompt_build"):
+                history = turn.memory.render() if turn.memory else None
+                for target in turn.targets:
+                    target["prompt"] = build_prompt(
+                        user_input=target["request"],
+                        context=turn.context,
+                        file_path=target["path"],
+                        symbol_summary=self.symbols.summarize_for(target["request"], target["path"]) or None,
+                        history=history
+                    )
+            return turn
+
+        with profile.stage("prompt_build"):
+            prompt_file_content = turn.file_content
+            if prompt_file_content and len(prompt_file_content) > FULL_FILE_MAX_CHARS:
+                prompt_file_content = None
+            turn.symbol_summary = self.symbols.summarize_for(user_input, turn.path) or None
+
+            turn.prompt = build_prompt(
+                user_input=user_input, 
+                context=turn.context,
+                file_content=prompt_file_content,
+                file_path=turn.path,
+                symbol_summary=turn.symbol_summary,
+                history=turn.memory.render() if turn.memory else None
+            )
+
+            # Follow-ups can continue the previous Ollama session instead
+            if turn.memory and turn.memory.llm_context:
+                turn.followup_prompt = build_followup_prompt(
+                    user_input=user_input,
+                    context=turn.context,
+                    file_content=prompt_file_content,
+                    file_path=turn.path,
+                    symbol_summary=turn.symbol_summary
+                )
+        return turn
+
+    def complete(self, turn: "AgentTurn") -> str:
+        """
+        Everything from the LLM call onwards: generation, code
+        extraction and file writes.
+        """
+        try:
+            with use_workspace(turn.workspace), span("agent.complete", **{"agent.mode": turn.mode}):
+                output = self._complete(turn)
+                if turn.skipped_templates:
+                    output = (
+                        f"ℹ️  Templates are not generated in multi-file requests; "
+                        f"ask for {', '.join(turn.skipped_templates)} separately.\n\n" + output
+                    )
+                return output
+        finally:
+            turn.profile.finish()
+            self.session_profile.record(turn.profile)
+            self.last_profile = turn.profile
+
+    def _complete(self, turn: "AgentTurn") -> str:
+        if turn.error:
+            turn.failed = True
+            return turn.error
+        if turn.direct_answer:
+            return turn.direct_answer
+        if turn.targets:
+            return self._complete_targets(turn)
+
+        mode = turn.mode
+        path = turn.path
+        file_content = turn.file_content
+        sources = turn.sources
+        profile = turn.profile
+
+        # STEP 5: Generate LLM response (model picked by mode/prompt size)
+        llm_stats = {}
+        memory = turn.memory
+        with profile.stage("llm_generation"):
+            raw = self.router.generate(
+                turn.prompt,
+                mode=mode,
+                stats=llm_stats,
+                context=memory.llm_context if memory else None,
+                context_model=memory.llm_context_model if memory else None,
+                followup_prompt=turn.followup_prompt,
+                on_token=turn.on_token,
+                should_stop=_ActionEarlyStop() if mode == "ACTION" else None,
+            ).strip()
+        _record_llm_stats(profile, llm_stats)
+
+        if raw.startswith("[ERROR]"):
+            turn.failed = True
+        elif memory:
+            memory.add(turn.user_input, raw, path=path)
+            memory.update_context(llm_stats.get("context"), llm_stats.get("model"))
 
         # STEP 6: Handle ANSWER MODE (no file operations, just display)
         if mode == "ANSWER":
@@ -82,6 +299,8 @@ class AgentCore:
                 ])
             
             cli_output.append(raw)
+            if llm_stats.get("done_reason") == "length":
+                cli_output.extend(["", "⚠️  Response truncated at the length limit."])
             
             if sources:
                 cli_output.extend(["", "=" * 60, "📚 Sources:", "=" * 60])
@@ -90,38 +309,46 @@ class AgentCore:
             return "\n".join(cli_output)
 
         # STEP 7: Handle ACTION MODE (extract code and write to file)
-        code = self._extract_code_only(raw)
+        if _cut_off(raw, llm_stats):
+            turn.failed = True
+            return "❌ Response hit the length limit before the code was complete. No file was written.\n\n" + raw
+        with profile.stage("code_extraction"):
+            code = self._extract_code_only(raw)
         if not code:
+            turn.failed = True
             return "❌ No code detected in LLM output.\n\n" + raw
 
         if not path:
+            turn.failed = True
             return "❌ ACTION MODE requires a file path.\n\n" + raw
 
-        # STEP 8: Remove duplicate imports if file exists
+        # STEP 8-10: Read the target once, then append (merging imports
+        # into the existing header) or create it. file_turn() keeps this to one disk check;
+        # file_lock() keeps concurrent turns on the same file from overwriting each other.
         try:
-            existing = read_file(path)
-            code = self._remove_duplicate_imports(existing, code)
-        except Exception:
-            pass  # file does not exist yet
-
-        # STEP 9: Decide safe action (write new file or append to existing)
-        try:
-            read_file(path)
-            action = "append_file"
-        except Exception:
-            action = "write_file"
+            with file_turn(), file_lock(path):
+                with profile.stage("file_read"):
+                    try:
+                        existing = read_file(path)
+                    except FileToolError:
+                        existing = None  # file does not exist yet
 
-        # STEP 10: Execute file action
-        try:
-            if action == "write_file":
-                write_file(path, code)
-                file_status = f"✅ File created: {path}"
-            else:
-                append_file(path, code)
-                file_status = f"✅ Code appended to: {path}"
+                with profile.stage("file_write"):
+                    if existing is None:
+                        write_file(path, code)
+                        file_status = f"✅ File created: {path}"
+                    else:
+                        merged, code = merge_imports(existing, code)
+                        if merged != existing:
+                            update_file(path, merged + "\n\n" + code)
+                        else:
+                            append_file(path, code)
+                        file_status = f"✅ Code appended to: {path}"
+            self.symbols.invalidate()
 
         except FileToolError as e:
             file_status = f"❌ [FILE ERROR] {e}"
+            turn.failed = True
 
         # STEP 11: Build CLI output
         cli_output = [file_status, "", "=" * 60, "📝 Full Response:", "=" * 60, raw]
@@ -132,6 +359,83 @@ class AgentCore:
 
         return "\n".join(cli_output)
 
+    def _complete_targets(self, turn: "AgentTurn") -> str:
+        """
+        Multi-file ACTION: generate every target concurrently, then
+        write them all together, or none if any target failed.
+        """
+        profile = turn.profile
+
+        def generate(target):
+            llm_stats = {}
+            raw = self.router.generate(
+                target["prompt"],
+                mode="ACTION",
+                stats=llm_stats,
+                should_stop=_ActionEarlyStop(),
+            ).strip()
+            return raw, llm_stats
+
+        # Streaming several files at once would interleave on screen,
+        # so on_token is not used here
+        with profile.stage("llm_generation"):
+            with ThreadPoolExecutor(max_workers=min(len(turn.targets), MAX_PARALLEL_TARGETS)) as pool:
+                results = list(pool.map(generate, turn.targets))
+
+        failed, cut_off = [], []
+        with profile.stage("code_extraction"):
+            for target, (raw, llm_stats) in zip(turn.targets, results):
+                _record_llm_stats(profile, llm_stats)
+                target["raw"] = raw
+                if _cut_off(raw, llm_stats):
+                    target["code"] = None
+                    cut_off.append(target["path"])
+                    continue
+                target["code"] = None if raw.startswith("[ERROR]") else self._extract_code_only(raw)
+                if not target["code"]:
+                    failed.append(target["path"])
+
+        responses = []
+        for target in turn.targets:
+            responses.extend(["", "=" * 60, f"📝 Response for {target['path']}:", "=" * 60, target["raw"]])
+
+        if turn.memory and len(failed) + len(cut_off) < len(turn.targets):
+            turn.memory.add(
+                turn.user_input,
+                "\n\n".join(f"{t['path']}:\n{t['raw']}" for t in turn.targets),
+                path=turn.path,
+            )
+
+        if failed or cut_off:
+            turn.failed = True
+            problems = []
+            if cut_off:
+                problems.append(f"❌ Hit the length limit before the code was complete: {', '.join(cut_off)}.")
+            if failed:
+                problems.append(f"❌ No code detected for: {', '.join(failed)}.")
+            return "\n".join(problems + ["No files were written."] + responses)
+
+        try:
+            with file_turn(), file_lock(*(t["path"] for t in turn.targets)):
+                with profile.stage("file_read"):
+                    plans = [plan_write(t["path"], t["code"]) for t in turn.targets]
+                with profile.stage("file_write"):
+                    apply_writes(plans)
+            self.symbols.invalidate()
+        except FileToolError as e:
+            turn.failed = True
+            return "\n".join([f"❌ [FILE ERROR] {e}. No files were written."] + responses)
+
+        cli_output = [describe(plan) for plan in plans]
+        cli_output.extend(["", "=" * 60, "📋 Combined Diff:", "=" * 60, combined_diff(plans)])
+        cli_output.extend(responses)
+
+        if turn.sources:
+            cli_output.extend(["", "=" * 60, "📚 Sources:", "=" * 60])
+            cli_output.extend(f"  • {s}" for s in turn.sources)
+
+        return "\n".join(cli_output)
+
     # ---------------- HELPERS ---------------- #
 
     def _detect_mode(self, user_input: str) -> str:
@@ -181,12 +485,31 @@ class AgentCore:
         # Default to ANSWER if no clear action verb
         return "ANSWER"
 
-    def _extract_path(self, user_input: str) -> str | None:
-        """Extract file path from user input"""
-        for token in user_input.split():
-            if token.endswith((".py", ".html")):
-                return token
-        return None
+    def _answer_from_index(self, user_input: str) -> str | None:
+        """
+        Answer "which app defines X" / "where is X defined" from the
+        symbol index without calling the LLM. Only names the index
+        knows are answered here; anything else ("what file contains the
+        settings for ...") goes through the normal path.
+        """
+        for pattern in _SYMBOL_LOOKUP:
+            match = pattern.search(user_input)
+            if match:
+                break
+        else:
+            return None
+
+        name = match.group(1)
+        self.symbols.wait(timeout=5)
+        matches = self.symbols.find(name)
+        if not matches:
+            return None
+
+        lines = [f"🔎 {name} is defined in:"]
+        for m in matches:
+            app = f" (app: {m['app']})" if m["app"] else ""
+            lines.append(f"  • {m['path']}{app} - {m['kind']}")
+        return "\n".join(lines)
 
     def _extract_code_only(self, text: str) -> str:
         """
@@ -194,8 +517,7 @@ class AgentCore:
         Returns clean Python code without markdown backticks or explanations
         """
         # First, try to extract from markdown code blocks
-        markdown_pattern = r'```(?:python)?\s*\n(.*?)\n```'
-        markdown_matches = re.findall(markdown_pattern, text, re.DOTALL)
+        markdown_matches = _CODE_BLOCK.findall(text)
         
         if markdown_matches:
             # Use the first code block found
@@ -210,14 +532,11 @@ class AgentCore:
             stripped = line.strip()
             
             # Start recording when we hit code-like lines
-            if stripped.startswith(("class ", "def ", "from ", "import ")):
+            if stripped.startswith(_CODE_START):
                 recording = True
             
             # Stop recording if we hit explanation markers
-            if recording and (
-                stripped.startswith(("Explanation:", "In order to", "Note:", "This"))
-                or stripped.lower().startswith(("you can", "the above", "in this"))
-            ):
+            if recording and _is_explanation(stripped):
                 break
             
             if recording:
@@ -260,27 +579,84 @@ class AgentCore:
         
         return code_str
 
-    def _remove_duplicate_imports(self, existing: str, new_code: str) -> str:
-        """
-        Removes imports from new_code that are already present in existing
-        Only removes exact matches and keeps the rest intact
-        """
-        existing_lines = existing.splitlines()
-        new_lines = new_code.splitlines()
-        filtered_lines = []
 
-        for line in new_lines:
-            stripped = line.strip()
-            
-            # Skip empty lines at the start
-            if not stripped and not filtered_lines:
-                continue
-            
-            # Check if this line already exists
-            if stripped and stripped not in [l.strip() for l in existing_lines]:
-                filtered_lines.append(line)
-            elif not stripped:
-                # Keep blank lines within the code
-                filtered_lines.append(line)
-
-        return "\n".join(filtered_lines).strip()
\ No newline at end of file
+def _is_explanation(stripped: str) -> bool:
+    return stripped.startswith(_EXPLANATION_START) or stripped.lower().startswith(_EXPLANATION_START_LOWER)
+
+
+class _ActionEarlyStop:
+    """
+    Streaming stop check for ACTION responses.
+
+    Mirrors AgentCore._extract_code_only: the code is complete once a
+    markdown code block closes, or once raw code is followed by an
+    explanation line. Generation stops when the explanation after it
+    reaches `budget` characters. Only text not yet scanned is looked at
+    on each call.
+    """
+
+    def __init__(self, budget: int = ACTION_EXPLANATION_BUDGET_CHARS):
+        self.budget = budget
+        self.code_end = None
+        self._scanned = 0
+        self._in_fence = False
+        self._recording = False
+
+    def __call__(self, text: str) -> bool:
+        if self.code_end is None:
+            self._scan(text)
+            if self.code_end is None:
+                return False
+        return len(text) - self.code_end >= self.budget
+
+    def _scan(self, text: str):
+        while self.code_end is None:
+            newline = text.find("\n", self._scanned)
+            if newline < 0:
+                # The explanation is often one long line; its start is
+                # enough to recognise it
+                partial = text[self._scanned:].strip()
+                if self._recording and not self._in_fence and len(partial) >= _MARKER_CHARS and _is_explanation(partial):
+                    self.code_end = self._scanned
+                return
+            stripped = text[self._scanned:newline].strip()
+            line_start, self._scanned = self._scanned, newline + 1
+
+            if stripped.startswith("```"):
+                if self._in_fence:
+                    self.code_end = self._scanned
+                self._in_fence = not self._in_fence
+            elif not self._in_fence:
+                if stripped.startswith(_CODE_START):
+                    self._recording = True
+                elif self._recording and _is_explanation(stripped):
+                    self.code_end = line_start
+
+
+def _cut_off(raw: str, llm_stats: dict) -> bool:
+    """
+    True if generation stopped at num_predict before the code was
+    complete (no closed code block, and no explanation after raw code).
+    Writing such code would leave a half-finished class in the file.
+    """
+    if llm_stats.get("done_reason") != "length":
+        return False
+    scan = _ActionEarlyStop()
+    scan._scan(raw + "\n")
+    return scan.code_end is None
+
+
+def _record_llm_stats(profile: TurnProfile, llm_stats: dict):
+    """Attach the model used and Ollama's own timings to a turn profile"""
+    if "model" in llm_stats:
+        profile.meta["model"] = llm_stats["model"]
+    if llm_stats.get("done_reason"):
+        profile.meta["done_reason"] = llm_stats["done_reason"]
+
+    timings = ollama_timings(llm_stats)
+    for name in ("load_s", "prompt_eval_s", "eval_s"):
+        if name in timings:
+            profile.add(f"llm.{name[:-2]}", timings[name])
+    for name in ("prompt_eval_count", "eval_count"):
+        if name in timings:
+            profile.meta[name] = timings[name]
@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def read_requests(lines):
+    """
+    Parse JSONL request lines.
+
+    Each line is either a JSON object with an "input" field (and an
+    optional "id" and "workspace"), or a bare JSON string. Blank lines
+    are skipped.
+
+    Yields:
+        dict with 'id' and 'input'
+    """
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"id": line_no, "input": None, "error": f"Invalid JSON: {e}"}
+            continue
+
+        if isinstance(item, str):
+            item = {"input": item}
+        if not isinstance(item, dict) or not item.get("input"):
+            yield {"id": line_no, "input": None, "error": "Missing 'input' field"}
+            continue
+
+        item.setdefault("id", line_no)
+        yield item
+
+
+def run_batch(agent, requests, write_result, parallel: int = 1, prefetch: int = 2) -> dict:
+    """
+    Run requests through an AgentCore with pipelined execution.
+
+    Up to `parallel` requests are generating at once, while up to
+    `prefetch` more are already doing retrieval and prompt building so
+    the next prompt is ready as soon as a generation slot frees up.
+    Results are written in input order. Requests that write the same
+    file take turns at the write (see file_tools.file_lock).
+
+    Args:
+        agent: AgentCore instance
+        requests: iterable of request dicts (see read_requests)
+        write_result: callable receiving one result dict per request
+        parallel: number of concurrent LLM generations
+        prefetch: number of requests prepared ahead of generation
+
+    Returns:
+        dict with batch totals
+    """
+    parallel = max(1, parallel)
+    prefetch = max(0, prefetch)
+    window = parallel + prefetch
+    generate_slots = threading.Semaphore(parallel)
+
+    totals = {"requests": 0, "failed": 0}
+    batch_start = time.perf_counter()
+    pending = deque()
+
+    def flush_one():
+        result = pending.popleft().result()
+        totals["requests"] += 1
+        if not result["ok"]:
+            totals["failed"] += 1
+        write_result(result)
+
+    with ThreadPoolExecutor(max_workers=window) as pool:
+        for item in requests:
+            if len(pending) >= window:
+                flush_one()
+            pending.append(pool.submit(_process, agent, item, generate_slots))
+
+        while pending:
+            flush_one()
+
+    totals["total_s"] = round(time.perf_counter() - batch_start, 4)
+    return totals
+
+
+def _process(agent, item: dict, generate_slots: threading.Semaphore) -> dict:
+    result = {"id": item.get("id"), "input": item.get("input")}
+    if item.get("error"):
+        result.update(ok=False, error=item["error"], timings={})
+        return result
+
+    submitted = time.perf_counter()
+    try:
+        turn = agent.prepare(item["input"], workspace=item.get("workspace"))
+        prepared = time.perf_counter()
+
+        with generate_slots:
+            started = time.perf_counter()
+            output = agent.complete(turn)
+        finished = time.perf_counter()
+
+    except Exception as e:
+        result.update(ok=False, error=str(e), timings={})
+        return result
+
+    result.update(
+        ok=not turn.failed,
+        workspace=turn.workspace,
+        mode=turn.mode,
+        path=turn.path,
+        sources=turn.sources,
+        output=output,
+        timings={
+            "prepare_s": round(prepared - submitted, 4),
+            "queue_s": round(started - prepared, 4),
+            "complete_s": round(finished - started, 4),
+            "total_s": round(finished - submitted, 4),
+        },
+        stages=turn.profile.as_dict(),
+    )
+    return result
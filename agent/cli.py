@@ -1,38 +1,418 @@
 import typer
 from rich import print
+import contextlib
+import json
+import re
 import sys
+from pathlib import Path
 
-from agent.agent_core import AgentCore
+from agent.batch import read_requests, run_batch
+from agent.client import DEFAULT_URL, DaemonClient
+from agent.daemon import DEFAULT_HOST, DEFAULT_PORT, token_path
+from agent.memory import ConversationMemory
+from agent.profiling import HotPathProfiler, TurnProfile
+from agent.workspace import workspaces
+from rag.reranker import enable_reranking
+from tracing import configure_tracing, shutdown_tracing
+
+# AgentCore is imported inside the commands that run it in-process, so
+# talking to a running daemon never loads the embedding model/ChromaDB
 
 app = typer.Typer()
 
 
 @app.command()
-def chat():
+def chat(
+    latency_budget: float = typer.Option(
+        None, "--latency-budget", help="Per-request latency budget in seconds used for model routing"
+    ),
+    profile: bool = typer.Option(
+        False, "--profile", help="Print a per-stage timing breakdown after every turn"
+    ),
+    cprofile: str = typer.Option(
+        None, "--cprofile", help="Collect a cProfile hot-path report; dumped to this path on exit"
+    ),
+    memory_turns: int = typer.Option(
+        3, "--memory-turns", help="Recent turns kept verbatim as follow-up context"
+    ),
+    memory_budget: int = typer.Option(
+        800, "--memory-budget", help="Token budget for conversation history in the prompt"
+    ),
+    reuse_context: bool = typer.Option(
+        False, "--reuse-context", help="Continue the Ollama session with its returned context tokens"
+    ),
+    daemon_url: str = typer.Option(
+        DEFAULT_URL, "--daemon-url", help="Agent daemon to use when it is running"
+    ),
+    local: bool = typer.Option(
+        False, "--local", help="Always run in-process, even if a daemon is running"
+    ),
+    workspace: str = typer.Option(
+        None, "--workspace", "-w", help="Workspace name (see add-workspace); a project directory also works in-process"
+    ),
+    low_memory: bool = typer.Option(
+        False, "--low-memory", help="Unload idle models, use reduced precision and smaller caches"
+    ),
+    idle_unload: float = typer.Option(
+        300, "--idle-unload", help="Low-memory mode: seconds idle before models are unloaded"
+    ),
+    embedding_precision: str = typer.Option(
+        "float16", "--embedding-precision", help="Low-memory mode: float32, float16 or int8"
+    ),
+    rerank: bool = typer.Option(
+        False, "--rerank", help="Rerank a wider retrieval pool with a cross-encoder"
+    ),
+    rerank_budget: float = typer.Option(
+        0.3, "--rerank-budget", help="Reranking latency budget per query in seconds"
+    ),
+    trace: str = typer.Option(
+        None, "--trace", help="Export OpenTelemetry spans: 'console' or 'file:PATH'"
+    ),
+):
     """
     Start an interactive chat session with the Django AI Agent.
+
+    If an agent daemon is running (see 'serve'), the session is a thin
+    client streaming responses from it; otherwise the agent runs
+    in-process. Options that configure the in-process agent (models,
+    memory, retrieval, tracing) are set on 'serve' instead when a
+    daemon is used.
+
+    Type /profile to see session-level timing percentiles and per-model
+    latency and, with --cprofile, /hotpath for the cProfile report so
+    far. /reset clears the conversation memory, /memory shows resident
+    memory per component and /workspace [NAME] shows or switches the
+    workspace.
     """
 
     print("[bold green]🤖 Django CLI AI Agent[/bold green]")
     print("[dim]Press Ctrl+C or Ctrl+D to exit[/dim]\n")
 
-    agent = AgentCore()
+    if not local:
+        client = DaemonClient(daemon_url, workspace=workspace)
+        if client.is_running():
+            ignored = [
+                option for option, given in [
+                    ("--latency-budget", latency_budget is not None),
+                    ("--cprofile", cprofile is not None),
+                    ("--memory-turns", memory_turns != 3),
+                    ("--memory-budget", memory_budget != 800),
+                    ("--reuse-context", reuse_context),
+                    ("--low-memory", low_memory),
+                    ("--rerank", rerank),
+                    ("--trace", trace is not None),
+                ] if given
+            ]
+            if ignored:
+                print(
+                    f"[dim]⚠️  Warning: ignored with a running daemon: {', '.join(ignored)} "
+                    f"(pass them to 'serve', or use --local)[/dim]"
+                )
+            _chat_with_daemon(client, profile)
+            return
+
+    from agent.agent_core import AgentCore
+    from agent.resources import enable_low_memory, format_memory_report, memory_report
+
+    if low_memory:
+        enable_low_memory(idle_seconds=idle_unload, precision=embedding_precision)
+    configure_tracing(trace)
+    if rerank:
+        enable_reranking(budget_s=rerank_budget)
+    if workspace:
+        _select_workspace(workspace)
+
+    memory = ConversationMemory(
+        keep_turns=memory_turns,
+        token_budget=memory_budget,
+        reuse_context=reuse_context,
+    )
+    agent = AgentCore(latency_budget=latency_budget, memory=memory)
+    hot_path = HotPathProfiler() if cprofile else None
 
     try:
         while True:
             user_input = typer.prompt("Ask")
 
-            response = agent.run(user_input)
+            if user_input.strip() == "/profile":
+                print(agent.session_profile.format())
+                print(agent.router.format_summary())
+                continue
+            if user_input.strip() == "/memory":
+                print(format_memory_report(memory_report(agent)))
+                continue
+            if user_input.strip() == "/reset":
+                memory.clear()
+                print("[dim]Conversation memory cleared[/dim]")
+                continue
+            if user_input.strip() == "/hotpath":
+                print(hot_path.report() if hot_path else "[dim]Start with --cprofile to enable[/dim]")
+                continue
+            if user_input.strip().startswith("/workspace"):
+                name = user_input.strip()[len("/workspace"):].strip()
+                if name:
+                    try:
+                        workspaces.default = workspaces.resolve_name(name, allow_path=True)
+                        memory.clear()
+                    except ValueError as e:
+                        print(f"[bold red]❌ {e}[/bold red]")
+                        continue
+                _print_workspace(workspaces.default)
+                continue
+
+            if hot_path:
+                with hot_path.active():
+                    response = agent.run(user_input)
+            else:
+                response = agent.run(user_input)
 
             print("\n[cyan]Agent:[/cyan]")
             print(response)
+            if profile and agent.last_profile:
+                print()
+                print(agent.last_profile.format())
             print("-" * 60)
 
     except (KeyboardInterrupt, EOFError):
         # Ctrl+C or Ctrl+D
+        if profile:
+            print("\n" + agent.session_profile.format())
+            print(agent.router.format_summary())
+        if hot_path:
+            hot_path.dump(cprofile)
+            print(hot_path.report())
+            print(f"[dim]cProfile stats written to {cprofile}[/dim]")
+        shutdown_tracing()
         print("\n[bold red]Session ended. Goodbye 👋[/bold red]")
         sys.exit(0)
 
 
+def _select_workspace(workspace: str):
+    """Make a --workspace name or directory the default, or exit with an error"""
+    try:
+        workspaces.default = workspaces.resolve_name(workspace, allow_path=True)
+    except ValueError as e:
+        # stderr, so batch output on stdout stays pure JSONL
+        print(f"[bold red]❌ {e}[/bold red]", file=sys.stderr)
+        raise typer.Exit(code=1)
+
+
+def _print_workspace(name: str):
+    spec = workspaces.specs()[name]
+    docs = f", project docs: {spec['collection']}" if spec.get("collection") else ""
+    print(f"[dim]Workspace: {name} ({spec['root']}{docs})[/dim]")
+
+
+def _chat_with_daemon(client: DaemonClient, profile: bool):
+    print(f"[dim]Connected to agent daemon at {client.url}[/dim]\n")
+
+    def on_event(event):
+        if event["event"] == "queued" and event["ahead"]:
+            print(f"[dim]⏳ Queued behind {event['ahead']} request(s)...[/dim]")
+        elif event["event"] == "token":
+            sys.stdout.write(event["text"])
+            sys.stdout.flush()
+
+    try:
+        while True:
+            user_input = typer.prompt("Ask")
+
+            if user_input.strip() == "/reset":
+                client.reset()
+                print("[dim]Conversation memory cleared[/dim]")
+                continue
+            if user_input.strip().startswith("/workspace"):
+                name = user_input.strip()[len("/workspace"):].strip()
+                if name:
+                    # Checked by the daemon on the next request (registered names only)
+                    client.workspace = name
+                    client.reset()
+                print(f"[dim]Workspace: {client.workspace or 'daemon default'}[/dim]")
+                continue
+
+            print("\n[cyan]Agent:[/cyan]")
+            result = client.run(user_input, on_event=on_event)
+
+            print("\n" + "-" * 60)
+            if result["event"] == "error":
+                print(f"[bold red]❌ {result['message']}[/bold red]")
+            else:
+                print(result["output"])
+                if profile and result.get("profile"):
+                    print()
+                    print(TurnProfile.from_dict(result["profile"], result.get("profile_meta")).format())
+            print("-" * 60)
+
+    except (KeyboardInterrupt, EOFError):
+        print("\n[bold red]Session ended. Goodbye 👋[/bold red]")
+        sys.exit(0)
+
+
+@app.command()
+def serve(
+    host: str = typer.Option(DEFAULT_HOST, "--host", help="Interface to bind (keep it local)"),
+    port: int = typer.Option(DEFAULT_PORT, "--port", help="Port to listen on"),
+    workers: int = typer.Option(1, "--workers", help="Requests processed concurrently"),
+    workspace: str = typer.Option(
+        None, "--workspace", "-w", help="Default workspace for requests that do not name one"
+    ),
+    latency_budget: float = typer.Option(
+        None, "--latency-budget", help="Per-request latency budget in seconds used for model routing"
+    ),
+    low_memory: bool = typer.Option(
+        False, "--low-memory", help="Unload idle models, use reduced precision and smaller caches"
+    ),
+    idle_unload: float = typer.Option(
+        300, "--idle-unload", help="Low-memory mode: seconds idle before models are unloaded"
+    ),
+    embedding_precision: str = typer.Option(
+        "float16", "--embedding-precision", help="Low-memory mode: float32, float16 or int8"
+    ),
+    rerank: bool = typer.Option(
+        False, "--rerank", help="Rerank a wider retrieval pool with a cross-encoder"
+    ),
+    rerank_budget: float = typer.Option(
+        0.3, "--rerank-budget", help="Reranking latency budget per query in seconds"
+    ),
+    trace: str = typer.Option(
+        None, "--trace", help="Export OpenTelemetry spans: 'console' or 'file:PATH'"
+    ),
+):
+    """
+    Run the agent as a long-lived local daemon shared by chat clients.
+
+    Each request may name its own workspace; workspaces are loaded on
+    first use and the least recently used are evicted under memory
+    pressure.
+    """
+    from agent.daemon import AgentDaemon
+    from agent.resources import enable_low_memory
+
+    if low_memory:
+        enable_low_memory(idle_seconds=idle_unload, precision=embedding_precision)
+    configure_tracing(trace)
+    if rerank:
+        enable_reranking(budget_s=rerank_budget)
+    if workspace:
+        _select_workspace(workspace)
+
+    daemon = AgentDaemon(host=host, port=port, workers=workers, latency_budget=latency_budget)
+    print("[dim]Warming up embedding model and vector store...[/dim]")
+    daemon.warm_up()
+    print(f"[bold green]🤖 Agent daemon listening on http://{host}:{port}[/bold green]")
+    print(f"[dim]Clients authenticate with the token in {token_path(daemon.port)}[/dim]")
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        daemon.close()
+        shutdown_tracing()
+        print("\n[bold red]Daemon stopped.[/bold red]")
+
+
+@app.command()
+def batch(
+    input_file: str = typer.Argument("-", help="JSONL file of requests, or '-' for stdin"),
+    output: str = typer.Option("-", "--output", "-o", help="JSONL results file, or '-' for stdout"),
+    parallel: int = typer.Option(1, "--parallel", "-p", help="Concurrent LLM generations"),
+    prefetch: int = typer.Option(2, "--prefetch", help="Requests prepared ahead of generation"),
+    workspace: str = typer.Option(
+        None, "--workspace", "-w", help="Default workspace for requests that do not name one"
+    ),
+    latency_budget: float = typer.Option(
+        None, "--latency-budget", help="Per-request latency budget in seconds used for model routing"
+    ),
+    profile: bool = typer.Option(
+        False, "--profile", help="Print per-stage timing percentiles for the whole batch"
+    ),
+    rerank: bool = typer.Option(
+        False, "--rerank", help="Rerank a wider retrieval pool with a cross-encoder"
+    ),
+    rerank_budget: float = typer.Option(
+        0.3, "--rerank-budget", help="Reranking latency budget per query in seconds"
+    ),
+    trace: str = typer.Option(
+        None, "--trace", help="Export OpenTelemetry spans: 'console' or 'file:PATH'"
+    ),
+):
+    """
+    Run requests from a JSONL file non-interactively.
+
+    Each line is {"id": ..., "input": "...", "workspace": ...} (id and
+    workspace optional; workspace must be a registered name) or a bare
+    JSON string. Results are written as JSONL with per-request timings.
+    """
+    from agent.agent_core import AgentCore
+
+    configure_tracing(trace)
+    if rerank:
+        enable_reranking(budget_s=rerank_budget)
+    if workspace:
+        _select_workspace(workspace)
+
+    source = sys.stdin if input_file == "-" else open(input_file, encoding="utf-8")
+    sink = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+
+    def write_result(result):
+        sink.write(json.dumps(result, ensure_ascii=False) + "\n")
+        sink.flush()
+
+    # Keep stdout clean for JSONL results; agent chatter (including
+    # start-up warnings from the model check) goes to stderr
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            agent = AgentCore(latency_budget=latency_budget)
+            totals = run_batch(
+                agent,
+                read_requests(source),
+                write_result,
+                parallel=parallel,
+                prefetch=prefetch,
+            )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+        shutdown_tracing()
+
+    print(
+        f"[bold green]✅ Batch done:[/bold green] {totals['requests']} requests, "
+        f"{totals['failed']} failed, {totals['total_s']:.1f}s",
+        file=sys.stderr,
+    )
+    if profile:
+        print(agent.session_profile.format(), file=sys.stderr)
+    if totals["failed"]:
+        raise typer.Exit(code=1)
+
+
+@app.command("add-workspace")
+def add_workspace(
+    name: str = typer.Argument(..., help="Workspace name"),
+    root: str = typer.Argument(..., help="Django project directory"),
+    docs: str = typer.Option(
+        None, "--docs", help="Directory of project .txt docs to index as the workspace's own collection"
+    ),
+):
+    """
+    Register a workspace so it can be selected with --workspace NAME.
+    """
+    if not Path(root).is_dir():
+        print(f"[bold red]❌ Not a directory: {root}[/bold red]")
+        raise typer.Exit(code=1)
+
+    collection = None
+    if docs:
+        from rag.setup import setup_rag
+
+        collection = "project_" + re.sub(r"[^A-Za-z0-9_-]", "_", name)
+        if not setup_rag(docs_path=docs, collection_name=collection):
+            raise typer.Exit(code=1)
+
+    workspaces.register(name, root, collection=collection, persist=True)
+    _print_workspace(name)
+
+
 if __name__ == "__main__":
     app()
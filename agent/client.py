@@ -0,0 +1,68 @@
+import json
+import os
+from urllib.parse import urlparse
+
+import requests
+
+from agent.daemon import DEFAULT_HOST, DEFAULT_PORT, read_token
+
+DEFAULT_URL = os.environ.get("DJANGO_AGENT_DAEMON_URL", f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+
+
+class DaemonClient:
+    """
+    Thin client for a running AgentDaemon.
+
+    Authenticates with the token the daemon wrote for its port; it is
+    re-read on every call so a restarted daemon is picked up.
+    """
+
+    def __init__(self, url: str = DEFAULT_URL, session: str | None = None, workspace: str | None = None):
+        self.url = url.rstrip("/")
+        self.workspace = workspace  # None uses the daemon's default
+        self.session = session or f"{os.getpid()}"
+        self.client = f"{os.environ.get('USER') or os.environ.get('USERNAME') or 'user'}@{os.getpid()}"
+        self.port = urlparse(self.url).port or DEFAULT_PORT
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {read_token(self.port) or ''}"}
+
+    def is_running(self, timeout: float = 0.5) -> bool:
+        """True if a daemon is up and accepts this user's token"""
+        try:
+            response = requests.get(f"{self.url}/health", headers=self._headers(), timeout=timeout)
+            return response.ok
+        except requests.exceptions.RequestException:
+            return False
+
+    def run(self, user_input: str, on_event=None) -> dict:
+        """
+        Send a request and stream events back.
+
+        Args:
+            user_input: The user's request
+            on_event: Optional callback receiving each event dict
+
+        Returns:
+            The final 'result' (or 'error') event
+        """
+        payload = {"input": user_input, "session": self.session, "client": self.client}
+        if self.workspace:
+            payload["workspace"] = self.workspace
+        final = {"event": "error", "message": "Daemon closed the stream without a result"}
+
+        with requests.post(f"{self.url}/run", json=payload, headers=self._headers(), stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if on_event:
+                    on_event(event)
+                if event["event"] in ("result", "error"):
+                    final = event
+
+        return final
+
+    def reset(self):
+        requests.post(f"{self.url}/reset", json={"session": self.session}, headers=self._headers(), timeout=5)
@@ -0,0 +1,314 @@
+import hmac
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Per-user directory for daemon tokens; only the owner can read them,
+# so only the owner's clients can submit requests
+TOKEN_DIR = Path(os.environ.get("DJANGO_AGENT_TOKEN_DIR", Path.home() / ".django_agent"))
+
+# Sessions idle for longer than this lose their conversation memory
+SESSION_IDLE_SECONDS = 3600
+
+
+def token_path(port: int = DEFAULT_PORT) -> Path:
+    return TOKEN_DIR / f"daemon-{port}.token"
+
+
+def write_token(port: int = DEFAULT_PORT) -> str:
+    """Create a fresh token for a daemon on `port`, readable by this user only"""
+    path = token_path(port)
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    token = secrets.token_urlsafe(32)
+
+    tmp_path = path.with_suffix(".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    os.chmod(tmp_path, 0o600)  # in case it already existed with wider permissions
+    os.replace(tmp_path, path)
+    return token
+
+
+def read_token(port: int = DEFAULT_PORT) -> str | None:
+    try:
+        return token_path(port).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+class Job:
+    """
+    One queued agent request. Events for the client are pushed onto
+    `events`; None marks the end of the stream.
+    """
+
+    def __init__(self, client: str, fn):
+        self.client = client
+        self.fn = fn
+        self.events = queue.Queue()
+        self.submitted = time.perf_counter()
+
+    def emit(self, event: str, **data):
+        self.events.put({"event": event, **data})
+
+
+class FairScheduler:
+    """
+    Run jobs on a fixed worker pool, round-robin across clients.
+
+    Each client has its own FIFO queue, and workers take one job from
+    each waiting client in turn. A client that submits many requests
+    cannot starve the others.
+    """
+
+    def __init__(self, workers: int = 1):
+        self._queues = OrderedDict()
+        self._cond = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job: Job) -> int:
+        """Queue a job and return how many jobs are ahead of it"""
+        with self._cond:
+            ahead = sum(len(q) for q in self._queues.values())
+            self._queues.setdefault(job.client, deque()).append(job)
+            self._cond.notify()
+        return ahead
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def _next(self) -> Job:
+        with self._cond:
+            while not self._queues:
+                self._cond.wait()
+            client, jobs = self._queues.popitem(last=False)
+            job = jobs.popleft()
+            if jobs:
+                self._queues[client] = jobs  # back of the line
+            return job
+
+    def _work(self):
+        while True:
+            job = self._next()
+            try:
+                job.fn(job)
+            except Exception as e:
+                job.emit("error", message=str(e))
+            finally:
+                job.events.put(None)
+
+
+class AgentDaemon:
+    """
+    Long-running process holding one warm AgentCore (embedding model,
+    vector store client, caches, model router) shared by all clients.
+
+    HTTP API (localhost only):
+        GET  /health          status and queue length
+        POST /run             {"input", "session", "client", "workspace"} -> NDJSON stream
+                              of queued / token / result / error events
+        POST /reset           {"session"} clears that session's memory
+
+    Every request must carry "Authorization: Bearer <token>", where the
+    token is written to a file only the daemon's user can read (see
+    write_token). Requests with an Origin header (browsers) and POST
+    bodies that are not application/json are rejected.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = 1, latency_budget=None):
+        # Imported here so the thin client never loads the heavy stack
+        from agent.agent_core import AgentCore
+
+        self.agent = AgentCore(latency_budget=latency_budget)
+        self.scheduler = FairScheduler(workers=workers)
+        self.sessions = {}
+        self._sessions_lock = threading.Lock()
+        self.started = time.time()
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.agent_daemon = self
+        self.port = self.server.server_address[1]
+        self.token = write_token(self.port)
+
+    def warm_up(self):
+        """Load the embedding model (and reranker) and open the vector store up front"""
+        from rag.embeddings import get_embedding_model
+        from rag.reranker import get_reranker, reranking_enabled
+        from rag.retriever import get_client
+
+        get_embedding_model()
+        get_client()
+        if reranking_enabled():
+            get_reranker().warm_up()
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def close(self):
+        self.server.server_close()
+        try:
+            token_path(self.port).unlink()
+        except OSError:
+            pass
+
+    def memory_for(self, session: str):
+        from agent.memory import ConversationMemory
+
+        now = time.monotonic()
+        with self._sessions_lock:
+            for key in [k for k, (_, seen) in self.sessions.items() if now - seen > SESSION_IDLE_SECONDS]:
+                del self.sessions[key]
+
+            memory = self.sessions.get(session, (None, None))[0] or ConversationMemory()
+            self.sessions[session] = (memory, now)
+            return memory
+
+    def reset(self, session: str):
+        with self._sessions_lock:
+            self.sessions.pop(session, None)
+
+    def run_job(self, job: Job, user_input: str, session: str, workspace: str | None = None):
+        started = time.perf_counter()
+        job.emit("started", queued_s=round(started - job.submitted, 4))
+
+        memory = self.memory_for(session) if session else None
+        turn = self.agent.prepare(
+            user_input,
+            memory=memory,
+            on_token=lambda text: job.emit("token", text=text),
+            workspace=workspace,
+        )
+        output = self.agent.complete(turn)
+        job.emit(
+            "result",
+            output=output,
+            workspace=turn.workspace,
+            profile=turn.profile.as_dict(),
+            profile_meta=turn.profile.meta,
+            total_s=round(time.perf_counter() - job.submitted, 4),
+        )
+
+    def health(self) -> dict:
+        from agent.resources import memory_report
+
+        with self._sessions_lock:
+            sessions = len(self.sessions)
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "pending": self.scheduler.pending(),
+            "sessions": sessions,
+            "memory": memory_report(self.agent),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format, *args):
+        pass  # keep the daemon console quiet
+
+    @property
+    def agent_daemon(self) -> AgentDaemon:
+        return self.server.agent_daemon
+
+    def _authorized(self) -> bool:
+        # Browsers always send Origin on cross-site requests; local
+        # clients never do
+        if self.headers.get("Origin") is not None:
+            self._send_json(403, {"error": "Cross-origin requests are not accepted"})
+            return False
+        given = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(given.encode("utf-8"), f"Bearer {self.agent_daemon.token}".encode("utf-8")):
+            self._send_json(401, {"error": "Missing or invalid daemon token"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/health":
+            self._send_json(200, self.agent_daemon.health())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._send_json(415, {"error": "Expected an application/json body"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "Invalid JSON body"})
+            return
+
+        if self.path == "/reset":
+            self.agent_daemon.reset(body.get("session", ""))
+            self._send_json(200, {"status": "ok"})
+            return
+
+        if self.path != "/run":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        user_input = body.get("input")
+        if not user_input:
+            self._send_json(400, {"error": "Missing 'input'"})
+            return
+
+        session = body.get("session", "")
+        client = body.get("client") or session or self.client_address[0]
+        workspace = body.get("workspace")
+        job = Job(client, lambda j: self.agent_daemon.run_job(j, user_input, session, workspace))
+        ahead = self.agent_daemon.scheduler.submit(job)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self._write_event({"event": "queued", "ahead": ahead})
+
+        # Keep draining even if the client disconnects so the job's
+        # events do not pile up
+        connected = True
+        while True:
+            event = job.events.get()
+            if event is None:
+                break
+            if connected:
+                connected = self._write_event(event)
+
+    def _write_event(self, event: dict) -> bool:
+        try:
+            self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            return True
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+
+    def _send_json(self, status: int, data: dict):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
@@ -0,0 +1,126 @@
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+# Upper bound on cached file contents (bytes of text held in memory)
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class _Entry:
+    __slots__ = ("mtime_ns", "size", "content", "turn")
+
+    def __init__(self, mtime_ns, size, content, turn):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.content = content  # None means "known not to exist"
+        self.turn = turn
+
+
+class WorkspaceFileCache:
+    """
+    Snapshot cache of workspace files keyed by resolved path.
+
+    - Entries are validated against mtime and size before reuse
+    - Inside a turn() block, an entry already validated during that
+      turn is trusted as-is, so one turn touches each file at most once
+    - Writes made through the file tools update the cache directly
+    - Least recently used entries are evicted past max_bytes
+    - lock(path) serializes read-modify-write sequences on one file
+      across threads (batch --parallel, daemon --workers)
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._turn_ids = itertools.count(1)
+        self._path_locks = {}
+
+    @contextmanager
+    def turn(self):
+        """Scope in which validated entries are not re-checked on disk"""
+        previous = getattr(self._local, "turn", None)
+        self._local.turn = next(self._turn_ids)
+        try:
+            yield
+        finally:
+            self._local.turn = previous
+
+    def lock(self, path: Path) -> threading.RLock:
+        """Lock guarding writes to path (held from the read to the write)"""
+        with self._lock:
+            return self._path_locks.setdefault(path, threading.RLock())
+
+    def read(self, path: Path) -> str | None:
+        """
+        Return file content, or None if the file does not exist.
+        """
+        current_turn = getattr(self._local, "turn", None)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and current_turn is not None and entry.turn == current_turn:
+                self._entries.move_to_end(path)
+                return entry.content
+
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._put(path, _Entry(None, None, None, current_turn))
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if (
+                entry is not None
+                and entry.content is not None
+                and entry.mtime_ns == stat.st_mtime_ns
+                and entry.size == stat.st_size
+            ):
+                entry.turn = current_turn
+                self._entries.move_to_end(path)
+                return entry.content
+
+        content = path.read_text(encoding="utf-8")
+        self._put(path, _Entry(stat.st_mtime_ns, stat.st_size, content, current_turn))
+        return content
+
+    def exists(self, path: Path) -> bool:
+        return self.read(path) is not None
+
+    def store(self, path: Path, content: str):
+        """Record content just written to path"""
+        stat = path.stat()
+        current_turn = getattr(self._local, "turn", None)
+        self._put(path, _Entry(stat.st_mtime_ns, stat.st_size, content, current_turn))
+
+    def forget(self, path: Path):
+        """Record that path was deleted"""
+        current_turn = getattr(self._local, "turn", None)
+        self._put(path, _Entry(None, None, None, current_turn))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _put(self, path: Path, entry: _Entry):
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None and old.content is not None:
+                self._bytes -= len(old.content)
+
+            self._entries[path] = entry
+            if entry.content is not None:
+                self._bytes += len(entry.content)
+
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                if evicted.content is not None:
+                    self._bytes -= len(evicted.content)
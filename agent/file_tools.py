@@ -1,5 +1,7 @@
 from pathlib import Path
-from agent.workspace import WORKSPACE_ROOT
+from contextlib import ExitStack, contextmanager
+from agent.workspace import active_workspace, workspaces
+from tracing import traced
 import difflib
 
 
@@ -7,41 +9,101 @@ class FileToolError(Exception):
     pass
 
 
-def _resolve_path(relative_path: str) -> Path:
-    path = (WORKSPACE_ROOT / relative_path).resolve()
-    if not str(path).startswith(str(WORKSPACE_ROOT)):
+# All tools act on the active workspace (see agent.workspace.use_workspace),
+# each of which has its own file cache
+
+
+def file_turn():
+    """Group file tool calls so each file is checked on disk only once"""
+    return active_workspace().file_cache.turn()
+
+
+@contextmanager
+def file_lock(*paths: str):
+    """
+    Hold the write locks of one or more workspace files, so concurrent
+    turns cannot interleave their read, merge and write of the same
+    file. Locks are taken in a fixed order to avoid deadlocks.
+    """
+    cache = active_workspace().file_cache
+    resolved = sorted({_resolve(path)[1] for path in paths})
+    with ExitStack() as stack:
+        for file_path in resolved:
+            stack.enter_context(cache.lock(file_path))
+        yield
+
+
+def set_file_cache_limit(max_bytes: int):
+    workspaces.set_file_cache_limit(max_bytes)
+
+
+def file_cache_bytes() -> int:
+    return sum(w.file_cache.size_bytes() for w in workspaces.loaded())
+
+
+def _resolve(path: str):
+    workspace = active_workspace()
+    return workspace.file_cache, _resolve_in(workspace.root, path)
+
+
+def _resolve_in(root: Path, relative_path: str) -> Path:
+    # Resolved on every call so a changed symlink cannot keep pointing
+    # at a stale (or outside) target
+    path = (root / relative_path).resolve()
+    if not path.is_relative_to(root):
         raise FileToolError("Access outside workspace denied")
     return path
 
 
+@contextmanager
+def _disk_errors(path: str):
+    """Report OS failures (permissions, full disk, ...) as FileToolError"""
+    try:
+        yield
+    except OSError as e:
+        raise FileToolError(f"{path}: {e.strerror or e}") from e
+
+
+@traced("file.read")
 def read_file(path: str) -> str:
-    file_path = _resolve_path(path)
-    if not file_path.exists():
+    cache, file_path = _resolve(path)
+    with _disk_errors(path):
+        content = cache.read(file_path)
+    if content is None:
         raise FileToolError(f"File not found: {path}")
-    return file_path.read_text(encoding="utf-8")
+    return content
 
 
+@traced("file.write")
 def write_file(path: str, content: str):
-    file_path = _resolve_path(path)
-    if file_path.exists():
-        raise FileToolError(f"File already exists: {path}")
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    file_path.write_text(content, encoding="utf-8")
+    cache, file_path = _resolve(path)
+    with _disk_errors(path):
+        if cache.exists(file_path):
+            raise FileToolError(f"File already exists: {path}")
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content, encoding="utf-8")
+        cache.store(file_path, content)
 
 
+@traced("file.append")
 def append_file(path: str, content: str):
-    file_path = _resolve_path(path)
-    if not file_path.exists():
-        raise FileToolError(f"File not found: {path}")
-    with file_path.open("a", encoding="utf-8") as f:
-        f.write("\n\n" + content)
+    cache, file_path = _resolve(path)
+    with _disk_errors(path):
+        existing = cache.read(file_path)
+        if existing is None:
+            raise FileToolError(f"File not found: {path}")
+        with file_path.open("a", encoding="utf-8") as f:
+            f.write("\n\n" + content)
+        cache.store(file_path, existing + "\n\n" + content)
 
 
+@traced("file.update")
 def update_file(path: str, new_content: str) -> str:
-    file_path = _resolve_path(path)
-    if not file_path.exists():
+    cache, file_path = _resolve(path)
+    with _disk_errors(path):
+        old_content = cache.read(file_path)
+    if old_content is None:
         raise FileToolError(f"File not found: {path}")
-    old_content = file_path.read_text(encoding="utf-8")
     diff = "\n".join(
         difflib.unified_diff(
             old_content.splitlines(),
@@ -51,12 +113,17 @@ def update_file(path: str, new_content: str) -> str:
             lineterm=""
         )
     )
-    file_path.write_text(new_content, encoding="utf-8")
+    with _disk_errors(path):
+        file_path.write_text(new_content, encoding="utf-8")
+        cache.store(file_path, new_content)
     return diff
 
 
+@traced("file.delete")
 def delete_file(path: str):
-    file_path = _resolve_path(path)
-    if not file_path.exists():
-        raise FileToolError(f"File not found: {path}")
-    file_path.unlink()
+    cache, file_path = _resolve(path)
+    with _disk_errors(path):
+        if not cache.exists(file_path):
+            raise FileToolError(f"File not found: {path}")
+        file_path.unlink()
+        cache.forget(file_path)
@@ -0,0 +1,254 @@
+import ast
+
+# Top-level blocks whose nested imports count as already imported
+# ("try: import json", "if TYPE_CHECKING: from x import y")
+_IMPORT_BLOCKS = {"try", "except", "else", "finally", "if", "elif", "with"}
+
+
+def merge_imports(existing: str, new_code: str) -> tuple[str, str]:
+    """
+    Merge the imports of generated code into an existing module.
+
+    The generated code is parsed with ast. For the existing module only
+    its top-level import statements are parsed, and the names they
+    import are collected once, so the cost is linear in the size of
+    the two sources and dominated by the (small) generated code.
+
+    - Imports already present in existing are dropped from new_code
+    - New names for a module existing already imports from
+      ("from x import a" + "from x import b") are folded into the
+      existing statement instead of being repeated
+    - Remaining new top-level imports are moved up to sit after the
+      existing module's last top-level import
+    - Names imported inside top-level try/if/with blocks count as
+      already imported and are never hoisted again
+    - Everything that is not a top-level import is left untouched
+
+    Args:
+        existing: Current content of the target file
+        new_code: Generated code about to be appended
+
+    Returns:
+        tuple: (updated_existing, new_body) - existing with the merged
+        and hoisted imports, and the code that still needs appending
+    """
+    try:
+        new_tree = ast.parse(new_code)
+    except SyntaxError:
+        return existing, _filter_import_lines(existing, new_code)
+
+    existing_lines = existing.splitlines()
+    existing_imports, guarded_imports = _scan_imports(existing_lines)
+    plain, from_names, mergeable = _collect_imports(existing_imports, existing_lines)
+    for node in guarded_imports:
+        # e.g. "try: import json" - already imported, leave it where it is
+        if isinstance(node, ast.Import):
+            plain.update((a.name, a.asname) for a in node.names)
+        else:
+            from_names.setdefault((node.level, node.module), set()).update((a.name, a.asname) for a in node.names)
+
+    new_lines = new_code.splitlines()
+    replacements = {}   # new_code line index -> replacement text ("" drops it)
+    extensions = {}     # existing ImportFrom node -> extra aliases
+    hoisted = []        # new import statements moved into existing
+    last_import = existing_imports[-1].end_lineno if existing_imports else None
+
+    for node in new_tree.body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+
+        if isinstance(node, ast.Import):
+            keep = []
+            for alias in node.names:
+                key = (alias.name, alias.asname)
+                if key not in plain:
+                    plain.add(key)
+                    keep.append(alias)
+            _place(replacements, hoisted, node, keep, new_lines, last_import)
+            continue
+
+        key = (node.level, node.module)
+        imported = from_names.setdefault(key, set())
+        keep = []
+        for alias in node.names:
+            name = (alias.name, alias.asname)
+            if name not in imported:
+                imported.add(name)
+                keep.append(alias)
+
+        target = mergeable.get(key)
+        if keep and target is not None and not any(a.name == "*" for a in keep):
+            extensions.setdefault(target, []).extend(keep)
+            keep = []
+        _place(replacements, hoisted, node, keep, new_lines, last_import)
+
+    updated_existing = _apply_extensions(existing, existing_lines, extensions, hoisted, last_import)
+
+    body = []
+    for index, line in enumerate(new_lines):
+        if index in replacements:
+            if replacements[index]:
+                body.append(replacements[index])
+        else:
+            body.append(line)
+
+    return updated_existing, "\n".join(body).strip()
+
+
+def _scan_imports(lines):
+    """
+    Parse only the top-level import statements of a module.
+
+    Statements start at column 0 with "import " or "from " and run
+    until brackets balance. Lines inside triple-quoted strings are
+    skipped. Statements that do not parse are ignored, so a module with
+    syntax errors elsewhere still merges cleanly.
+
+    Returns:
+        tuple: (top-level import nodes, imports nested in top-level
+        try/if/with blocks) - the nested ones only count as already
+        imported, they are never merged into or hoisted after
+    """
+    nodes = []
+    guarded = []
+    in_string = None
+    block = None  # first word of the enclosing column-0 statement
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        stripped = line.lstrip()
+        indent = len(line) - len(stripped)
+
+        if in_string is None and stripped and not stripped.startswith("#") and not indent:
+            block = stripped.split(None, 1)[0].rstrip(":")
+
+        nested = indent and block in _IMPORT_BLOCKS
+        if in_string is None and stripped.startswith(("import ", "from ")) and (not indent or nested):
+            start = index
+            depth = line.count("(") - line.count(")")
+            while (depth > 0 or lines[index].rstrip().endswith("\\")) and index + 1 < len(lines):
+                index += 1
+                depth += lines[index].count("(") - lines[index].count(")")
+
+            snippet = "\n".join(l[indent:] for l in lines[start:index + 1])
+            try:
+                tree = ast.parse(snippet)
+            except SyntaxError:
+                tree = None
+            if tree is not None:
+                for node in tree.body:
+                    if isinstance(node, (ast.Import, ast.ImportFrom)):
+                        ast.increment_lineno(node, start)
+                        (guarded if indent else nodes).append(node)
+            index += 1
+            continue
+
+        for quote in ('"""', "'''"):
+            if line.count(quote) % 2 == 1 and in_string in (None, quote):
+                in_string = None if in_string else quote
+        index += 1
+
+    return nodes, guarded
+
+
+def _collect_imports(nodes, lines):
+    """
+    Return (plain imports, from-import names by module, mergeable nodes).
+
+    A from-import is mergeable when it sits alone on a single line at
+    module level, so it can be regenerated without losing comments or
+    neighbouring statements.
+    """
+    plain = set()
+    from_names = {}
+    mergeable = {}
+
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            plain.update((a.name, a.asname) for a in node.names)
+
+        elif isinstance(node, ast.ImportFrom):
+            key = (node.level, node.module)
+            from_names.setdefault(key, set()).update((a.name, a.asname) for a in node.names)
+
+            line = lines[node.lineno - 1]
+            if (
+                key not in mergeable
+                and node.lineno == node.end_lineno
+                and node.col_offset == 0
+                and line[:node.end_col_offset].strip() == line.strip()
+                and not any(a.name == "*" for a in node.names)
+            ):
+                mergeable[key] = node
+
+    return plain, from_names, mergeable
+
+
+def _place(replacements, hoisted, node, keep, new_lines, last_import):
+    """Hoist what is left of a new import into existing, or rewrite it in place"""
+    if keep and last_import is not None:
+        _drop(replacements, node)
+        if len(keep) == len(node.names):
+            hoisted.append("\n".join(new_lines[node.lineno - 1:node.end_lineno]).strip())
+        else:
+            hoisted.append(_unparse(node, keep))
+        return
+    _rewrite(replacements, node, keep, new_lines)
+
+
+def _drop(replacements, node):
+    for index in range(node.lineno - 1, node.end_lineno):
+        replacements[index] = ""
+
+
+def _rewrite(replacements, node, keep, new_lines):
+    if len(keep) == len(node.names):
+        return  # nothing removed, keep the original text
+    _drop(replacements, node)
+    if keep:
+        indent = new_lines[node.lineno - 1][:node.col_offset]
+        replacements[node.lineno - 1] = indent + _unparse(node, keep)
+
+
+def _unparse(node, names):
+    if isinstance(node, ast.Import):
+        return ast.unparse(ast.Import(names=names))
+    return ast.unparse(ast.ImportFrom(module=node.module, names=names, level=node.level))
+
+
+def _apply_extensions(existing, lines, extensions, hoisted, last_import):
+    if not extensions and not hoisted:
+        return existing
+
+    lines = list(lines)
+    for node, extra in extensions.items():
+        lines[node.lineno - 1] = _unparse(node, list(node.names) + extra)
+    if hoisted:
+        lines[last_import:last_import] = hoisted
+
+    updated = "\n".join(lines)
+    if existing.endswith("\n"):
+        updated += "\n"
+    return updated
+
+
+def _import_lines(code):
+    return {
+        line.strip()
+        for line in code.splitlines()
+        if line.strip().startswith(("import ", "from "))
+    }
+
+
+def _filter_import_lines(existing, new_code):
+    """Line-based fallback used when the generated code does not parse"""
+    seen = _import_lines(existing)
+    kept = []
+    for line in new_code.splitlines():
+        stripped = line.strip()
+        if stripped.startswith(("import ", "from ")) and not line[:1].isspace():
+            if stripped in seen:
+                continue
+            seen.add(stripped)
+        kept.append(line)
+    return "\n".join(kept).strip()
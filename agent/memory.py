@@ -0,0 +1,118 @@
+import threading
+
+from llm.router import estimate_tokens
+
+# Characters of each side of a turn kept verbatim
+TURN_CHAR_LIMIT = 600
+
+# Characters of each side of a turn kept once folded into the summary
+SUMMARY_CHAR_LIMIT = 120
+
+
+class ConversationMemory:
+    """
+    Bounded session memory for follow-up questions.
+
+    - The last `keep_turns` turns are kept verbatim (truncated)
+    - Older turns are folded into a rolling one-line-per-turn summary
+    - The rendered history never exceeds `token_budget` tokens; when it
+      would, the oldest verbatim turn is folded, then the oldest
+      summary lines are dropped
+    - Optionally keeps Ollama's returned `context` tokens so the next
+      turn can continue the same model session instead of re-sending
+      the system prompt and history
+    """
+
+    def __init__(
+        self,
+        keep_turns: int = 3,
+        token_budget: int = 800,
+        reuse_context: bool = False,
+        max_context_tokens: int = 4096,
+        summarizer=None,
+    ):
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.reuse_context = reuse_context
+        self.max_context_tokens = max_context_tokens
+        self.summarizer = summarizer or _fold_turn
+        self.turns = []
+        self.summary = []
+        self.llm_context = None
+        self.llm_context_model = None
+        self._lock = threading.Lock()
+
+    def add(self, user_input: str, response: str, path: str | None = None):
+        turn = {
+            "user": _truncate(user_input, TURN_CHAR_LIMIT),
+            "agent": _truncate(response, TURN_CHAR_LIMIT),
+            "path": path,
+        }
+        with self._lock:
+            self.turns.append(turn)
+            while len(self.turns) > self.keep_turns:
+                self.summary.append(self.summarizer(self.turns.pop(0)))
+            self._enforce_budget()
+
+    def update_context(self, context: list | None, model: str | None):
+        """Remember Ollama's context tokens if they fit the limit"""
+        with self._lock:
+            if (
+                self.reuse_context
+                and context
+                and model
+                and len(context) <= self.max_context_tokens
+            ):
+                self.llm_context = context
+                self.llm_context_model = model
+            else:
+                self.llm_context = None
+                self.llm_context_model = None
+
+    def render(self) -> str:
+        with self._lock:
+            return self._render()
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self.summary.clear()
+            self.llm_context = None
+            self.llm_context_model = None
+
+    def _render(self) -> str:
+        parts = []
+        if self.summary:
+            parts.append("Earlier in this session:")
+            parts.extend(self.summary)
+        for turn in self.turns:
+            parts.append(f"User: {turn['user']}")
+            parts.append(f"Agent: {turn['agent']}")
+        return "\n".join(parts)
+
+    def _enforce_budget(self):
+        while estimate_tokens(self._render()) > self.token_budget:
+            if self.turns and (len(self.turns) > 1 or not self.summary):
+                self.summary.append(self.summarizer(self.turns.pop(0)))
+            elif self.summary:
+                self.summary.pop(0)
+            else:
+                break
+
+
+def _fold_turn(turn: dict) -> str:
+    """Cheap extractive one-line summary of a turn"""
+    line = f"- Asked: {_truncate(' '.join(turn['user'].split()), SUMMARY_CHAR_LIMIT)}"
+    if turn.get("path"):
+        line += f" [file: {turn['path']}]"
+    answer = turn["agent"].strip().splitlines()
+    if answer:
+        line += f" -> {_truncate(answer[0], SUMMARY_CHAR_LIMIT)}"
+    return line
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = text.strip()
+    if len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + "..."
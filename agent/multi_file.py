@@ -0,0 +1,172 @@
+import difflib
+import re
+import sys
+
+from agent.file_tools import FileToolError, delete_file, read_file, update_file, write_file
+from agent.imports import merge_imports
+
+# Concurrent generations for one multi-file request
+MAX_PARALLEL_TARGETS = 4
+
+_PATH_TOKEN = re.compile(r"[\w./\\-]+\.(?:py|html)\b")
+_LEADING_FILLER = re.compile(r"^[\s,;.]*(?:(?:and|then|also|plus)\b[\s,]*)*", re.I)
+
+# A path is written to when its own clause asks for code, or when it is
+# named as the place code goes ("... in forms.py")
+_ACTION_VERB = re.compile(
+    r"\b(?:create|write|generate|build|add|implement|make|develop|insert|update|modify|change)\b", re.I
+)
+_WRITE_PREPOSITION = re.compile(r"\b(?:in|into|to|inside)\s+(?:the\s+)?(?:file\s+)?$", re.I)
+
+# "create models.py and admin.py": a path joined to a target only by a
+# conjunction is a target too
+_CONJUNCTION_ONLY = re.compile(r"^[\s,]*(?:(?:and|or|plus)\b[\s,]*)?$", re.I)
+
+# A path named right after one of these is only referred to
+# ("tests in tests.py for models.py")
+_REFERENCE_PREPOSITION = re.compile(
+    r"\b(?:for|from|of|on|using|like|with|against|read|reading)\s+(?:the\s+)?(?:file\s+)?$", re.I
+)
+
+
+def find_paths(user_input: str) -> list[str]:
+    """All .py/.html paths mentioned in a request, in order, without repeats"""
+    paths = []
+    for match in _PATH_TOKEN.finditer(user_input):
+        if match.group() not in paths:
+            paths.append(match.group())
+    return paths
+
+
+def _clauses(user_input: str, paths: list[str]):
+    """
+    Yield (path, clause, text before the path) for each path mention.
+    Each clause runs from the end of the previous path mention to the
+    end of its own.
+    """
+    start = 0
+    for path in paths:
+        position = user_input.find(path, start)
+        end = position + len(path)
+        yield path, user_input[start:end], user_input[start:position]
+        start = end
+
+
+def write_targets(user_input: str, paths: list[str]) -> list[str]:
+    """
+    The mentioned paths the request asks to write code into.
+
+    A path is a target when its own clause has an action verb or it is
+    named as a destination ("in views.py") or joined to a target by a
+    conjunction ("models.py and admin.py"), unless it directly follows
+    a reference word ("tests in tests.py for models.py" only targets
+    tests.py).
+    """
+    targets = []
+    previous_is_target = False
+    for path, clause, before in _clauses(user_input, paths):
+        if _REFERENCE_PREPOSITION.search(before):
+            previous_is_target = False
+            continue
+        previous_is_target = bool(
+            _ACTION_VERB.search(clause)
+            or _WRITE_PREPOSITION.search(before)
+            or (previous_is_target and _CONJUNCTION_ONLY.match(before))
+        )
+        if previous_is_target:
+            targets.append(path)
+    return targets
+
+
+def scoped_requests(user_input: str, paths: list[str]) -> dict:
+    """
+    Split a multi-file request into one request per target file.
+
+    Each file's clause runs from the end of the previous path mention
+    to the end of its own ("..., a form in library/forms.py"), and is
+    sent with the full request so the model sees how the files relate.
+
+    Returns:
+        dict mapping path -> scoped request text
+    """
+    requests = {}
+    for path, clause, _ in _clauses(user_input, paths):
+        clause = _LEADING_FILLER.sub("", clause).strip()
+        others = ", ".join(p for p in paths if p != path)
+        requests[path] = (
+            f"{clause}\n\n"
+            f"(Part of a larger request: \"{user_input.strip()}\". "
+            f"Write ONLY the code for {path}; {others} are generated separately.)"
+        )
+    return requests
+
+
+def plan_write(path: str, code: str) -> dict:
+    """
+    Work out the new content of one target without touching the disk
+    beyond reading it (call inside file_turn()).
+
+    Returns:
+        dict with 'path', 'old' (None for a new file) and 'new'
+    """
+    try:
+        existing = read_file(path)
+    except FileToolError:
+        existing = None  # file does not exist yet
+
+    if existing is None:
+        return {"path": path, "old": None, "new": code}
+
+    merged, code = merge_imports(existing, code)
+    return {"path": path, "old": existing, "new": merged + "\n\n" + code}
+
+
+def apply_writes(plans: list[dict]):
+    """
+    Write all planned files. If one write fails, the files already
+    written are restored and the error is re-raised (the file tools
+    report disk errors as FileToolError).
+    """
+    done = []
+    try:
+        for plan in plans:
+            if plan["old"] is None:
+                write_file(plan["path"], plan["new"])
+            else:
+                update_file(plan["path"], plan["new"])
+            done.append(plan)
+    except FileToolError:
+        for plan in reversed(done):
+            try:
+                if plan["old"] is None:
+                    delete_file(plan["path"])
+                else:
+                    update_file(plan["path"], plan["old"])
+            except FileToolError as e:
+                print(f"⚠️  Warning: Could not restore {plan['path']}: {e}", file=sys.stderr)
+        raise
+
+
+def combined_diff(plans: list[dict]) -> str:
+    """One unified diff covering every planned file"""
+    chunks = []
+    for plan in plans:
+        old = plan["old"] or ""
+        chunks.extend(
+            difflib.unified_diff(
+                old.splitlines(),
+                plan["new"].splitlines(),
+                fromfile="/dev/null" if plan["old"] is None else f"a/{plan['path']}",
+                tofile=f"b/{plan['path']}",
+                lineterm=""
+            )
+        )
+    return "\n".join(chunks)
+
+
+def describe(plan: dict) -> str:
+    old_lines = plan["old"].splitlines() if plan["old"] is not None else []
+    added = len(plan["new"].splitlines()) - len(old_lines)
+    if plan["old"] is None:
+        return f"✅ File created: {plan['path']} (+{added} lines)"
+    return f"✅ Code appended to: {plan['path']} (+{added} lines)"
@@ -0,0 +1,145 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TurnProfile:
+    """
+    Stage timings for a single agent turn.
+
+    Stages are recorded in the order they first run; a stage that runs
+    more than once accumulates its time.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.meta = {}
+        self._start = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self):
+        self.total = time.perf_counter() - self._start
+
+    def as_dict(self) -> dict:
+        data = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+        if self.total is not None:
+            data["total"] = round(self.total, 4)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict, meta: dict | None = None) -> "TurnProfile":
+        """Rebuild a finished profile from as_dict() output (e.g. sent by the daemon)"""
+        profile = cls()
+        profile.stages = {name: seconds for name, seconds in data.items() if name != "total"}
+        profile.meta = dict(meta or {})
+        profile.total = data.get("total")
+        return profile
+
+    def format(self) -> str:
+        lines = ["⏱️  Turn profile:"]
+        for key, value in self.meta.items():
+            lines.append(f"   {key}: {value}")
+        for name, seconds in self.stages.items():
+            lines.append(f"   {name:<24} {seconds * 1000:9.1f} ms")
+        if self.total is not None:
+            lines.append(f"   {'total':<24} {self.total * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+class SessionProfile:
+    """
+    Collects turn profiles and reports per-stage percentiles.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self.turns = 0
+        self._lock = threading.Lock()
+
+    def record(self, profile: TurnProfile):
+        with self._lock:
+            self.turns += 1
+            for name, seconds in profile.as_dict().items():
+                self.samples.setdefault(name, []).append(seconds)
+
+    def percentiles(self, qs=(50, 90, 99)) -> dict:
+        with self._lock:
+            return {
+                name: {f"p{q}": percentile(values, q) for q in qs}
+                for name, values in self.samples.items()
+            }
+
+    def format(self) -> str:
+        table = self.percentiles()
+        if not table:
+            return "⏱️  No turns profiled yet."
+
+        lines = [f"⏱️  Session profile ({self.turns} turns, ms):"]
+        lines.append(f"   {'stage':<24} {'p50':>9} {'p90':>9} {'p99':>9}")
+        for name, row in table.items():
+            lines.append(
+                f"   {name:<24} "
+                + " ".join(f"{row[k] * 1000:9.1f}" for k in ("p50", "p90", "p99"))
+            )
+        return "\n".join(lines)
+
+
+class HotPathProfiler:
+    """
+    Thin wrapper around cProfile for on-demand hot-path reports.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    @contextmanager
+    def active(self):
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def report(self, limit: int = 25, sort: str = "cumulative") -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def dump(self, path: str):
+        self.profiler.dump_stats(path)
+
+
+def ollama_timings(data: dict) -> dict:
+    """
+    Convert Ollama's nanosecond duration fields to seconds.
+    """
+    timings = {}
+    for field in ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration"):
+        if data.get(field) is not None:
+            timings[field.replace("_duration", "_s")] = data[field] / 1e9
+    for field in ("prompt_eval_count", "eval_count"):
+        if data.get(field) is not None:
+            timings[field] = data[field]
+    return timings
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile (q in 0-100) of a non-empty sequence"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -1,4 +1,19 @@
-def build_prompt(user_input: str, context: str | None = None, file_content: str | None = None, file_path: str | None = None) -> str:
+from tracing import span
+
+
+def build_prompt(user_input: str, context: str | None = None, file_content: str | None = None, file_path: str | None = None, symbol_summary: str | None = None, history: str | None = None) -> str:
+    with span("agent.build_prompt") as current:
+        prompt = _build_prompt(user_input, context, file_content, file_path, symbol_summary, history)
+        current.set_attributes({
+            "prompt.chars": len(prompt),
+            "prompt.context_chars": len(context or ""),
+            "prompt.file_chars": len(file_content or ""),
+            "prompt.history_chars": len(history or ""),
+        })
+        return prompt
+
+
+def _build_prompt(user_input, context, file_content, file_path, symbol_summary, history) -> str:
     system_instruction = (
         "You are a Django AI Agent.\n\n"
 
@@ -185,12 +200,41 @@ def build_prompt(user_input: str, context: str | None = None, file_content: str
     # Build the full prompt
     prompt_parts = [system_instruction]
 
+    # Add earlier turns of this session (bounded by ConversationMemory)
+    if history:
+        prompt_parts.append("\n--- CONVERSATION SO FAR ---")
+        prompt_parts.append(history)
+        prompt_parts.append("--- END CONVERSATION ---\n")
+
+    prompt_parts.extend(_request_parts(user_input, context, file_content, file_path, symbol_summary))
+
+    return "\n".join(prompt_parts)
+
+
+def build_followup_prompt(user_input: str, context: str | None = None, file_content: str | None = None, file_path: str | None = None, symbol_summary: str | None = None) -> str:
+    """
+    Prompt for a turn that continues an Ollama session via its returned
+    `context` tokens: the system instructions and earlier turns are
+    already in that context, so only the new request is sent.
+    """
+    return "\n".join(_request_parts(user_input, context, file_content, file_path, symbol_summary))
+
+
+def _request_parts(user_input, context, file_content, file_path, symbol_summary) -> list:
+    prompt_parts = []
+
     # Add file content if provided (for ANSWER MODE with file reading)
     if file_content and file_path:
         prompt_parts.append(f"\n--- FILE CONTENT FROM {file_path} ---")
         prompt_parts.append(file_content)
         prompt_parts.append("--- END FILE CONTENT ---\n")
 
+    # Add compact project symbols (models, views, urls...) if available
+    if symbol_summary:
+        prompt_parts.append("\n--- PROJECT SYMBOLS ---")
+        prompt_parts.append(symbol_summary)
+        prompt_parts.append("--- END PROJECT SYMBOLS ---\n")
+
     # Add RAG context if available
     if context:
         prompt_parts.append("\n--- DJANGO DOCUMENTATION CONTEXT ---")
@@ -201,4 +245,4 @@ def build_prompt(user_input: str, context: str | None = None, file_content: str
     prompt_parts.append("\nUser Request:")
     prompt_parts.append(user_input)
 
-    return "\n".join(prompt_parts)
\ No newline at end of file
+    return prompt_parts
@@ -0,0 +1,83 @@
+from agent import file_tools
+from agent.workspace import workspaces
+from rag.resources import IdleUnloader, rss_bytes
+
+# File cache cap used in low-memory mode
+LOW_MEMORY_FILE_CACHE_BYTES = 4 * 1024 * 1024
+
+
+def enable_low_memory(idle_seconds: float = 300, precision: str = "float16") -> IdleUnloader:
+    """
+    Switch this process to low-memory mode.
+
+    - The embedding model is loaded in reduced precision
+    - The embedding model and vector store are unloaded after
+      `idle_seconds` without use and reloaded lazily
+    - Workspace file caches are capped lower
+
+    Returns:
+        The running IdleUnloader
+    """
+    from rag.embeddings import configure_embeddings
+
+    configure_embeddings(precision=precision)
+    file_tools.set_file_cache_limit(LOW_MEMORY_FILE_CACHE_BYTES)
+    return IdleUnloader(idle_seconds).start()
+
+
+def memory_report(agent=None) -> dict:
+    """
+    Resident memory per component, in bytes.
+
+    Model and store figures are the RSS growth measured when each was
+    loaded (plus the embedding weights size); caches report the size
+    of the data they hold.
+    """
+    from rag.embeddings import embedding_model_memory
+    from rag.retriever import vector_store_memory
+
+    report = {
+        "process_rss_bytes": rss_bytes(),
+        "embedding_model": embedding_model_memory(),
+        "vector_store": vector_store_memory(),
+        "file_cache": {"bytes": file_tools.file_cache_bytes()},
+        "workspaces": {
+            w.name: {
+                "file_cache_bytes": w.file_cache.size_bytes(),
+                "symbol_index_bytes": w.symbols.size_bytes(),
+            }
+            for w in workspaces.loaded()
+        },
+    }
+    if agent is not None:
+        report["symbol_index"] = {"bytes": agent.symbols.size_bytes()}
+    return report
+
+
+def format_memory_report(report: dict) -> str:
+    lines = ["🧠 Memory:"]
+    lines.append(f"   {'process RSS':<18} {_mb(report.get('process_rss_bytes'))}")
+    for name in ("embedding_model", "vector_store", "file_cache", "symbol_index"):
+        if name not in report:
+            continue
+        info = report[name]
+        if info.get("loaded") is False:
+            lines.append(f"   {name:<18} not loaded")
+            continue
+        size = info.get("rss_delta_bytes", info.get("bytes"))
+        extra = ""
+        if "weights_bytes" in info:
+            extra = f" (weights {_mb(info['weights_bytes'])}, {info['precision']})"
+        lines.append(f"   {name:<18} {_mb(size)}{extra}")
+    for name, info in report.get("workspaces", {}).items():
+        lines.append(
+            f"   workspace {name}: files {_mb(info['file_cache_bytes'])}, "
+            f"symbols {_mb(info['symbol_index_bytes'])}"
+        )
+    return "\n".join(lines)
+
+
+def _mb(value) -> str:
+    if value is None:
+        return "unknown"
+    return f"{value / (1024 * 1024):.1f} MB"
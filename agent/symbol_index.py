@@ -0,0 +1,398 @@
+import ast
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Persisted indexes, one JSON file per workspace root
+INDEX_DIR = Path(__file__).parent.parent / "data" / "symbol_index"
+
+# Bump when the per-file symbol layout changes
+INDEX_VERSION = 1
+
+# Minimum seconds between background refreshes. Each one walks and
+# stats the whole workspace, which is slow on network mounts; files the
+# agent writes itself trigger a refresh on the next turn (invalidate())
+REFRESH_INTERVAL = 60.0
+
+SKIP_DIRS = {
+    ".git", ".hg", ".venv", "venv", "env", "node_modules",
+    "__pycache__", "migrations", "static", "media", ".mypy_cache",
+}
+
+SYMBOL_KINDS = {
+    "models": "model",
+    "views": "view",
+    "forms": "form",
+    "classes": "class",
+    "functions": "function",
+}
+
+RELATION_FIELDS = {"ForeignKey", "OneToOneField", "ManyToManyField"}
+MODEL_BASES = {"Model", "AbstractUser", "AbstractBaseUser"}
+
+_TEMPLATE_TAG = re.compile(r"{%\s*(extends|include|block|url)\s+['\"]?([\w:./-]+)")
+
+
+class SymbolIndex:
+    """
+    Incremental index of a Django workspace's Python and template files.
+
+    For each file it records models (with fields), views, forms, URL
+    patterns and imports (or, for templates, extends/include/block/url
+    tags). Files are re-parsed only when their mtime or size changes,
+    and the index is persisted between sessions.
+    """
+
+    def __init__(self, root: Path, index_path: Path | None = None):
+        self.root = Path(root)
+        digest = hashlib.sha1(str(self.root).encode("utf-8")).hexdigest()[:12]
+        self.index_path = index_path or INDEX_DIR / f"{digest}.json"
+        self.files = {}
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._refresh_started = False  # a background refresh is queued or running (guarded by _lock)
+        self._ready = threading.Event()
+        self._last_refresh = 0.0
+        self._loaded = False
+
+    # ---------------- BUILD ---------------- #
+
+    def load(self):
+        """Load the persisted index, if any"""
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+
+        if data.get("version") == INDEX_VERSION and data.get("root") == str(self.root):
+            with self._lock:
+                self.files = data.get("files", {})
+        self._loaded = True
+
+    def save(self):
+        with self._lock:
+            data = {"version": INDEX_VERSION, "root": str(self.root), "files": self.files}
+            payload = json.dumps(data)
+
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self) -> int:
+        """
+        Re-parse new or changed files and drop deleted ones.
+
+        Returns:
+            Number of files added, updated or removed
+        """
+        with self._refreshing:
+            if not self._loaded:
+                self.load()
+
+            seen = set()
+            changed = 0
+            for path in self._walk():
+                rel = path.relative_to(self.root).as_posix()
+                seen.add(rel)
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+
+                with self._lock:
+                    entry = self.files.get(rel)
+                if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                    continue
+
+                symbols = _parse_file(path)
+                with self._lock:
+                    self.files[rel] = {
+                        "mtime_ns": stat.st_mtime_ns,
+                        "size": stat.st_size,
+                        "symbols": symbols,
+                    }
+                changed += 1
+
+            with self._lock:
+                removed = [rel for rel in self.files if rel not in seen]
+                for rel in removed:
+                    del self.files[rel]
+            changed += len(removed)
+
+            if changed:
+                try:
+                    self.save()
+                except OSError:
+                    pass
+
+            self._last_refresh = time.monotonic()
+            self._ready.set()
+            return changed
+
+    def start_background(self):
+        """
+        Load and refresh the index in a daemon thread, unless a
+        background refresh is already running.
+        """
+        with self._lock:
+            if self._refresh_started:
+                return None
+            self._refresh_started = True
+        thread = threading.Thread(target=self._refresh_quietly, daemon=True)
+        thread.start()
+        return thread
+
+    def ensure_fresh(self):
+        """Kick off a background refresh if the index may be stale"""
+        if time.monotonic() - self._last_refresh < REFRESH_INTERVAL:
+            return
+        self.start_background()
+
+    def invalidate(self):
+        """Refresh on the next ensure_fresh() (e.g. after the agent wrote a file)"""
+        self._last_refresh = 0.0
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the first refresh has finished"""
+        return self._ready.wait(timeout)
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"⚠️  Warning: Symbol index refresh failed: {e}", file=sys.stderr)
+            self._ready.set()
+        finally:
+            with self._lock:
+                self._refresh_started = False
+
+    def _walk(self):
+        if not self.root.is_dir():
+            return
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+            for filename in filenames:
+                if filename.endswith((".py", ".html")):
+                    yield Path(dirpath) / filename
+
+    # ---------------- LOOKUP ---------------- #
+
+    def find(self, name: str) -> list[dict]:
+        """
+        Find where a symbol is defined.
+
+        Returns:
+            list of dicts with 'kind', 'name', 'path' and 'app'
+        """
+        matches = []
+        with self._lock:
+            items = list(self.files.items())
+
+        for rel, entry in items:
+            symbols = entry["symbols"]
+            for kind, label in SYMBOL_KINDS.items():
+                for symbol in symbols.get(kind, []):
+                    if symbol["name"] == name:
+                        matches.append({
+                            "kind": label,
+                            "name": name,
+                            "path": rel,
+                            "app": _app_of(rel),
+                        })
+        return matches
+
+    def summarize(self, paths, max_chars: int = 2000) -> str:
+        """
+        Compact one-line-per-file summary of the given files.
+        """
+        with self._lock:
+            entries = [(rel, self.files[rel]) for rel in paths if rel in self.files]
+
+        lines = []
+        for rel, entry in entries:
+            line = _summarize_file(rel, entry["symbols"])
+            if line:
+                lines.append(line)
+
+        summary = "\n".join(lines)
+        if len(summary) > max_chars:
+            summary = summary[:max_chars].rsplit("\n", 1)[0] + "\n..."
+        return summary
+
+    def app_files(self, app: str) -> list[str]:
+        with self._lock:
+            return sorted(rel for rel in self.files if _app_of(rel) == app)
+
+    def summarize_for(self, text: str, path: str | None = None, max_chars: int = 2000) -> str:
+        """
+        Summary relevant to a request: the target file's app plus any
+        files defining CamelCase names mentioned in the text.
+        """
+        paths = []
+        if path:
+            paths.extend(self.app_files(_app_of(Path(path).as_posix())))
+
+        for name in set(re.findall(r"\b[A-Z][A-Za-z0-9]+\b", text)):
+            for match in self.find(name):
+                if match["path"] not in paths:
+                    paths.append(match["path"])
+
+        return self.summarize(paths, max_chars=max_chars)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return len(json.dumps(self.files))
+
+
+def _app_of(rel: str) -> str:
+    parts = rel.split("/")
+    return parts[0] if len(parts) > 1 else ""
+
+
+def _parse_file(path: Path) -> dict:
+    try:
+        source = path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return {}
+
+    if path.suffix == ".html":
+        return _parse_template(source)
+
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return {"error": "syntax"}
+    return _parse_python(tree, path.name)
+
+
+def _parse_template(source: str) -> dict:
+    symbols = {"extends": [], "includes": [], "blocks": [], "url_tags": []}
+    keys = {"extends": "extends", "include": "includes", "block": "blocks", "url": "url_tags"}
+    for tag, value in _TEMPLATE_TAG.findall(source):
+        bucket = symbols[keys[tag]]
+        if value not in bucket:
+            bucket.append(value)
+    return {k: v for k, v in symbols.items() if v}
+
+
+def _parse_python(tree: ast.Module, filename: str) -> dict:
+    symbols = {
+        "models": [], "views": [], "forms": [], "urls": [],
+        "classes": [], "functions": [], "imports": [],
+    }
+
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            symbols["imports"].extend(a.name for a in node.names)
+
+        elif isinstance(node, ast.ImportFrom):
+            module = "." * node.level + (node.module or "")
+            symbols["imports"].append(module)
+
+        elif isinstance(node, ast.ClassDef):
+            bases = [_tail(b) for b in node.bases]
+            fields = _model_fields(node)
+            entry = {"name": node.name, "line": node.lineno, "bases": bases}
+
+            if any(b.endswith("Form") for b in bases):
+                symbols["forms"].append(entry)
+            elif any(b.endswith(("View", "ViewSet")) for b in bases):
+                symbols["views"].append(entry)
+            elif any(b in MODEL_BASES for b in bases) or (filename == "models.py" and fields):
+                entry["fields"] = fields
+                symbols["models"].append(entry)
+            else:
+                symbols["classes"].append(entry)
+
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            entry = {"name": node.name, "line": node.lineno}
+            args = node.args.args
+            if args and args[0].arg == "request":
+                symbols["views"].append(entry)
+            else:
+                symbols["functions"].append(entry)
+
+        elif isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Name) and t.id == "urlpatterns" for t in node.targets
+        ):
+            symbols["urls"].extend(_url_patterns(node.value))
+
+    return {k: v for k, v in symbols.items() if v}
+
+
+def _model_fields(node: ast.ClassDef) -> list[str]:
+    fields = []
+    for stmt in node.body:
+        if (
+            isinstance(stmt, ast.Assign)
+            and len(stmt.targets) == 1
+            and isinstance(stmt.targets[0], ast.Name)
+            and isinstance(stmt.value, ast.Call)
+        ):
+            field_type = _tail(stmt.value.func)
+            if field_type.endswith("Field") or field_type in RELATION_FIELDS:
+                field = f"{stmt.targets[0].id}:{field_type}"
+                if field_type in RELATION_FIELDS and stmt.value.args:
+                    field += f"->{_tail(stmt.value.args[0])}"
+                fields.append(field)
+    return fields
+
+
+def _url_patterns(value) -> list[dict]:
+    patterns = []
+    if not isinstance(value, (ast.List, ast.Tuple)):
+        return patterns
+
+    for item in value.elts:
+        if not isinstance(item, ast.Call) or _tail(item.func) not in ("path", "re_path"):
+            continue
+        pattern = {"route": None, "view": None, "name": None}
+        if item.args and isinstance(item.args[0], ast.Constant):
+            pattern["route"] = item.args[0].value
+        if len(item.args) > 1:
+            pattern["view"] = ast.unparse(item.args[1])
+        for keyword in item.keywords:
+            if keyword.arg == "name" and isinstance(keyword.value, ast.Constant):
+                pattern["name"] = keyword.value.value
+        patterns.append(pattern)
+    return patterns
+
+
+def _tail(node) -> str:
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Subscript):
+        return _tail(node.value)
+    return ast.unparse(node)
+
+
+def _summarize_file(rel: str, symbols: dict) -> str:
+    parts = []
+    if symbols.get("models"):
+        parts.append("models " + ", ".join(
+            f"{m['name']}({', '.join(m.get('fields', []))})" for m in symbols["models"]
+        ))
+    for kind in ("views", "forms", "classes", "functions"):
+        if symbols.get(kind):
+            parts.append(f"{kind} " + ", ".join(s["name"] for s in symbols[kind]))
+    if symbols.get("urls"):
+        parts.append("urls " + ", ".join(
+            f"'{u['route']}'->{u['view']}" + (f"[{u['name']}]" if u["name"] else "")
+            for u in symbols["urls"]
+        ))
+    for kind in ("extends", "blocks", "url_tags"):
+        if symbols.get(kind):
+            parts.append(f"{kind} " + ", ".join(symbols[kind]))
+    if not parts:
+        return ""
+    return f"{rel}: " + "; ".join(parts)
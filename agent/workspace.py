@@ -1,5 +1,210 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
 
+from agent.file_cache import DEFAULT_MAX_BYTES as FILE_CACHE_MAX_BYTES, WorkspaceFileCache
+from agent.symbol_index import SymbolIndex
+
 WORKSPACE_ROOT = Path(
-    r"D:\Final_Project_Folder\django_cli_agent\agent_test_project"
+    os.environ.get("DJANGO_AGENT_WORKSPACE", r"D:\Final_Project_Folder\django_cli_agent\agent_test_project")
 ).resolve()
+
+# Registered workspaces: {"name": {"root": "...", "collection": "..." or null}}
+WORKSPACES_FILE = Path(__file__).parent.parent / "data" / "workspaces.json"
+
+DEFAULT_WORKSPACE = "default"
+
+# Loaded workspaces beyond either limit are evicted, least recently used first
+MAX_LOADED_WORKSPACES = 8
+WORKSPACES_MAX_BYTES = 128 * 1024 * 1024
+
+
+class Workspace:
+    """
+    One Django project the agent works on: its root directory, file
+    cache, symbol index and optional project doc collection (searched
+    alongside the Django docs).
+    """
+
+    def __init__(self, name: str, root: Path, collection: str | None = None, file_cache_bytes: int = FILE_CACHE_MAX_BYTES):
+        self.name = name
+        self.root = Path(root).resolve()
+        self.collection = collection
+        self.file_cache = WorkspaceFileCache(max_bytes=file_cache_bytes)
+        self.symbols = SymbolIndex(self.root)
+        self.users = 0  # turns currently running in this workspace
+
+    def start(self):
+        """Load and refresh the symbol index in the background"""
+        self.symbols.start_background()
+        return self
+
+    def collections(self) -> list[str] | None:
+        """Vector collections to search, or None for the Django docs only"""
+        if not self.collection:
+            return None
+        from rag.retriever import DOCS_COLLECTION
+
+        return [DOCS_COLLECTION, self.collection]
+
+    def size_bytes(self) -> int:
+        return self.file_cache.size_bytes() + self.symbols.size_bytes()
+
+    def unload(self):
+        self.file_cache.clear()
+
+
+class WorkspaceManager:
+    """
+    Registry of workspaces, loaded lazily on first use.
+
+    Loaded workspaces are kept in LRU order; loading another one evicts
+    the least recently used (and not currently running) workspaces
+    once more than `max_loaded` are loaded or their caches and indexes
+    together exceed `max_bytes`. Evicted workspaces reload on next use
+    (their symbol indexes are persisted, so reloading is cheap).
+    """
+
+    def __init__(self, config_path: Path = WORKSPACES_FILE, max_loaded: int = MAX_LOADED_WORKSPACES, max_bytes: int = WORKSPACES_MAX_BYTES):
+        self.config_path = Path(config_path)
+        self.max_loaded = max_loaded
+        self.max_bytes = max_bytes
+        self.file_cache_bytes = FILE_CACHE_MAX_BYTES
+        self.default = DEFAULT_WORKSPACE
+        self._specs = None
+        self._loaded = OrderedDict()
+        self._lock = threading.RLock()
+
+    # ---------------- REGISTRY ---------------- #
+
+    def specs(self) -> dict:
+        with self._lock:
+            if self._specs is None:
+                self._specs = {DEFAULT_WORKSPACE: {"root": str(WORKSPACE_ROOT), "collection": None}}
+                try:
+                    self._specs.update(json.loads(self.config_path.read_text(encoding="utf-8")))
+                except (OSError, ValueError):
+                    pass
+            return self._specs
+
+    def register(self, name: str, root, collection: str | None = None, persist: bool = False):
+        """
+        Add or replace a workspace definition; with persist, also save
+        it to the workspaces file so later sessions know it.
+        """
+        spec = {"root": str(Path(root).resolve()), "collection": collection}
+        with self._lock:
+            self.specs()[name] = spec
+            stale = self._loaded.pop(name, None)
+            if persist:
+                # Only explicitly registered workspaces are saved, not
+                # directories opened ad hoc by path
+                try:
+                    saved = json.loads(self.config_path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    saved = {}
+                saved[name] = spec
+                self.config_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.config_path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(saved, indent=2), encoding="utf-8")
+                os.replace(tmp_path, self.config_path)
+        if stale is not None:
+            stale.unload()
+
+    def resolve_name(self, name_or_path: str, allow_path: bool = False) -> str:
+        """
+        Map a registered name to a workspace name. With allow_path, a
+        directory path is also accepted and registered on the fly under
+        its resolved path; only local CLI options pass it, so daemon and
+        batch requests cannot point the agent at arbitrary directories.
+        """
+        if name_or_path in self.specs():
+            return name_or_path
+        if allow_path:
+            path = Path(name_or_path).expanduser()
+            if path.is_dir():
+                name = str(path.resolve())
+                if name not in self.specs():
+                    self.register(name, path)
+                return name
+        raise ValueError(f"Unknown workspace: {name_or_path} (register it with add-workspace)")
+
+    # ---------------- LOADING ---------------- #
+
+    def get(self, name: str | None = None) -> Workspace:
+        """Loaded workspace by registered name (default: self.default)"""
+        name = self.resolve_name(name or self.default)
+        with self._lock:
+            workspace = self._loaded.get(name)
+            if workspace is not None:
+                self._loaded.move_to_end(name)
+                return workspace
+
+            spec = self.specs()[name]
+            workspace = Workspace(name, spec["root"], spec.get("collection"), self.file_cache_bytes)
+            self._loaded[name] = workspace
+            evicted = self._evict(keep=name)
+
+        for old in evicted:
+            old.unload()
+        return workspace.start()
+
+    def set_file_cache_limit(self, max_bytes: int):
+        with self._lock:
+            self.file_cache_bytes = max_bytes
+            for workspace in self._loaded.values():
+                workspace.file_cache.max_bytes = max_bytes
+
+    def loaded(self) -> list[Workspace]:
+        with self._lock:
+            return list(self._loaded.values())
+
+    def _evict(self, keep: str) -> list[Workspace]:
+        evicted = []
+        total = sum(w.size_bytes() for w in self._loaded.values())
+        for name in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded and total <= self.max_bytes:
+                break
+            workspace = self._loaded[name]
+            if name == keep or workspace.users:
+                continue
+            del self._loaded[name]
+            total -= workspace.size_bytes()
+            evicted.append(workspace)
+        return evicted
+
+
+workspaces = WorkspaceManager()
+
+_active = ContextVar("active_workspace", default=None)
+
+
+def active_workspace() -> Workspace:
+    """
+    The workspace of the running turn (see use_workspace), otherwise
+    the manager's default workspace.
+    """
+    return _active.get() or workspaces.get()
+
+
+@contextmanager
+def use_workspace(name: str | None = None):
+    """
+    Make a workspace active for the file tools, symbol lookups and
+    retrieval in this thread. `name` is a registered name; None
+    selects the default workspace.
+    """
+    workspace = workspaces.get(name)
+    with workspaces._lock:
+        workspace.users += 1
+    token = _active.set(workspace)
+    try:
+        yield workspace
+    finally:
+        _active.reset(token)
+        with workspaces._lock:
+            workspace.users -= 1
@@ -0,0 +1,147 @@
+"""
+Benchmark import merging on large generated Django modules.
+
+Compares the previous line-matching dedupe (O(n*m)) with the
+ast-based merge_imports (linear). merge_imports rewrites existing
+files, so its output is first checked against known cases (module
+docstrings, multi-line, relative and try/except imports); the script
+exits with an error if any of them regresses.
+
+Run from the project root:
+    python benchmarks/bench_import_merge.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent.imports import merge_imports
+
+
+def legacy_remove_duplicate_imports(existing, new_code):
+    """The line-matching dedupe AgentCore used before merge_imports"""
+    existing_lines = existing.splitlines()
+    filtered_lines = []
+    for line in new_code.splitlines():
+        stripped = line.strip()
+        if not stripped and not filtered_lines:
+            continue
+        if stripped and stripped not in [l.strip() for l in existing_lines]:
+            filtered_lines.append(line)
+        elif not stripped:
+            filtered_lines.append(line)
+    return "\n".join(filtered_lines).strip()
+
+
+def make_models(n):
+    parts = ["from django.db import models", "from django.conf import settings", ""]
+    for i in range(n):
+        parts.extend([
+            "",
+            f"class Model{i}(models.Model):",
+            "    title = models.CharField(max_length=200)",
+            "    created_at = models.DateTimeField(auto_now_add=True)",
+            f"    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='m{i}')",
+            "",
+        ])
+    return "\n".join(parts)
+
+
+def make_views(n):
+    parts = [
+        "from django.shortcuts import get_object_or_404, render",
+        "from django.views.generic import ListView",
+        "from .models import Model0",
+        "",
+    ]
+    for i in range(n):
+        parts.extend([
+            "",
+            f"def view_{i}(request, pk):",
+            "    obj = get_object_or_404(Model0, pk=pk)",
+            "    return render(request, 'detail.html', {'object': obj})",
+            "",
+        ])
+    return "\n".join(parts)
+
+
+# (name, existing, generated, expected existing, expected appended code)
+CASES = [
+    (
+        "import text in a module docstring",
+        '"""Views.\n\nimport os is not needed here.\n"""\nfrom django.shortcuts import render\n\n\n'
+        'def index(request):\n    return render(request, "index.html")\n',
+        "import os\n\n\ndef env(request):\n    return os.environ",
+        '"""Views.\n\nimport os is not needed here.\n"""\nfrom django.shortcuts import render\nimport os\n\n\n'
+        'def index(request):\n    return render(request, "index.html")\n',
+        "def env(request):\n    return os.environ",
+    ),
+    (
+        "multi-line import",
+        "from django.db.models import (\n    CharField,\n    IntegerField,\n)\n\nX = 1\n",
+        "from django.db.models import CharField, TextField\n\n\nclass A:\n    pass",
+        "from django.db.models import (\n    CharField,\n    IntegerField,\n)\nfrom django.db.models import TextField\n\nX = 1\n",
+        "class A:\n    pass",
+    ),
+    (
+        "relative import",
+        "from .models import Book\n\n\nclass BookForm:\n    pass\n",
+        "from .models import Book, Author\n\n\nclass AuthorForm:\n    pass",
+        "from .models import Book, Author\n\n\nclass BookForm:\n    pass\n",
+        "class AuthorForm:\n    pass",
+    ),
+    (
+        "import inside top-level try/except",
+        "import os\n\ntry:\n    import json\nexcept ImportError:\n    json = None\n",
+        "import json\n\n\ndef load(s):\n    return json.loads(s)",
+        "import os\n\ntry:\n    import json\nexcept ImportError:\n    json = None\n",
+        "def load(s):\n    return json.loads(s)",
+    ),
+]
+
+
+def check_cases() -> bool:
+    ok = True
+    for name, existing, new_code, expected_existing, expected_body in CASES:
+        merged, body = merge_imports(existing, new_code)
+        passed = merged == expected_existing and body == expected_body
+        ok = ok and passed
+        print(f"   {'✅' if passed else '❌'} {name}")
+        if not passed:
+            print(f"      existing: {merged!r}\n      appended: {body!r}")
+    return ok
+
+
+def bench(label, fn, existing, new_code, repeat=3):
+    best = min(_time(fn, existing, new_code) for _ in range(repeat))
+    print(f"   {label:<28} {best * 1000:10.2f} ms")
+    return best
+
+
+def _time(fn, existing, new_code):
+    start = time.perf_counter()
+    fn(existing, new_code)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print("\n" + "IMPORT MERGE BENCHMARK".center(60))
+    print("=" * 60)
+
+    print("\n🔎 Correctness:")
+    if not check_cases():
+        sys.exit(1)
+
+    for name, make in (("models.py", make_models), ("views.py", make_views)):
+        for n in (200, 1000, 4000):
+            existing = make(n)
+            new_code = make(n // 10 or 1).replace("Model0", "Model1")
+            print(f"\n📄 {name}: {len(existing.splitlines())} existing lines, "
+                  f"{len(new_code.splitlines())} new lines")
+            old = bench("legacy line matching", legacy_remove_duplicate_imports, existing, new_code, repeat=1)
+            new = bench("ast merge_imports", merge_imports, existing, new_code)
+            print(f"   speedup: {old / new:.1f}x")
+
+    print("\n" + "=" * 60 + "\n")
@@ -0,0 +1,120 @@
+"""
+Benchmark retrieval quality and latency, with and without the
+cross-encoder rerank stage and MMR diversity selection.
+
+Each query is labelled with the documentation file(s) that answer it.
+Reports hit@k (an answering file among the top k chunks), MRR (of the
+first answering chunk) and per-query latency, including the time the
+rerank stage adds and how often it fell back to first-stage order.
+Every run states whether MMR selection is on; only the "+ MMR" run
+uses it, so the others measure plain top-k.
+
+Needs a built vector store (python -m rag.setup). Run from the project
+root:
+    python benchmarks/bench_retrieval.py [--k 4] [--budget 0.3]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent.profiling import percentile
+from rag.reranker import enable_reranking
+from rag.retriever import retrieve_candidates
+
+QUERIES = [
+    ("How do I add a ForeignKey field to a model?", {"django_model_field_reference.txt"}),
+    ("What does on_delete=models.CASCADE do?", {"django_model_field_reference.txt"}),
+    ("How can I avoid N+1 queries with select_related?", {"django_queryset_api_reference.txt", "django_database_access_optimization.txt"}),
+    ("Create a ModelForm for an existing model", {"django_modelforms_and_formsets_reference.txt"}),
+    ("How do I validate a form field in clean()?", {"django_forms_validation_and_security_overview.txt", "django_forms_working_with_forms_complete_reference.txt"}),
+    ("Map a URL pattern with a path converter", {"django_url_dispatcher_and_routing.txt"}),
+    ("How do I write a class-based ListView?", {"django_generic_class_based_views.txt", "django_class_based_generic_views_flattened_index.txt"}),
+    ("Protect a view so only logged-in users can access it", {"django_auth_system_usage_views_permissions_and_templates.txt"}),
+    ("Use a custom user model", {"django_authentication_customization.txt"}),
+    ("How do I create and apply migrations?", {"django_migrations_guide.txt", "django_how_to_create_database_migrations.txt"}),
+    ("Run a data migration with RunPython", {"django_migration_operations_reference.txt"}),
+    ("Cache a view for 15 minutes", {"django_cache_framework.txt", "django_view_decorators_http_cache_gzip_common.txt"}),
+    ("Paginate a queryset in a view", {"django_pagination.txt"}),
+    ("Send an email with send_mail", {"django_sending_email.txt"}),
+    ("Serve static files in production", {"django_static_files_production_deployment.txt", "django_static_files.txt"}),
+    ("Write a custom template filter", {"django_custom_template_tags_and_filters_complete_reference.txt"}),
+    ("How do I test a view with the test client?", {"django_testing_tools.txt"}),
+    ("Aggregate the average price over a queryset", {"django_aggregation_guide.txt"}),
+    ("Wrap several saves in a database transaction", {"django_database_transactions_guide.txt"}),
+    ("Add a custom admin action", {"django_admin_actions_reference.txt"}),
+    ("Store messages for the next request with the messages framework", {"django_messages_framework.txt"}),
+    ("Configure logging to a file", {"django_logging_configuration.txt"}),
+    ("Use F expressions to update a field atomically", {"django_query_expressions_reference.txt"}),
+    ("Write a custom management command", {"django_custom_management_commands.txt"}),
+]
+
+
+def run(k: int, rerank: bool, diversify: bool = False) -> dict:
+    hits, reciprocal_ranks, latencies, rerank_times = 0, [], [], []
+    for query, expected in QUERIES:
+        timings = {}
+        start = time.perf_counter()
+        candidates = retrieve_candidates(query, k=k, timings=timings, rerank=rerank, diversify=diversify)
+        latencies.append(time.perf_counter() - start)
+        if rerank:
+            rerank_times.append(timings.get("rerank", 0.0))
+
+        rank = next((i for i, c in enumerate(candidates, 1) if c["source"] in expected), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    result = {
+        "hit@k": hits / len(QUERIES),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+    if rerank:
+        result["rerank_p50_ms"] = percentile(rerank_times, 50) * 1000
+        result["rerank_p95_ms"] = percentile(rerank_times, 95) * 1000
+    return result
+
+
+def _print(label, result):
+    line = (
+        f"{label:<24} hit@k {result['hit@k']:.2f}  MRR {result['mrr']:.3f}  "
+        f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms"
+    )
+    if "rerank_p50_ms" in result:
+        line += f"  (rerank p50 {result['rerank_p50_ms']:.1f} ms, p95 {result['rerank_p95_ms']:.1f} ms)"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=4, help="Chunks kept per query")
+    parser.add_argument("--budget", type=float, default=0.3, help="Rerank latency budget (s)")
+    args = parser.parse_args()
+
+    print(f"{len(QUERIES)} labelled queries, k={args.k}\n")
+
+    # Warm the embedding model and vector store so the first query is not an outlier
+    retrieve_candidates(QUERIES[0][0], k=args.k, rerank=False, diversify=False)
+    _print("vector search", run(args.k, rerank=False))
+    _print("vector search + MMR", run(args.k, rerank=False, diversify=True))
+
+    reranker = enable_reranking(budget_s=args.budget, warm_up=True)
+
+    reranker.budget_s = float("inf")
+    _print("rerank (no budget)", run(args.k, rerank=True))
+
+    # Scores are cached per (query, chunk); start cold for the budgeted run
+    reranker.clear_cache()
+    reranker.budget_s = args.budget
+    reranker.fallbacks = 0
+    _print(f"rerank ({args.budget:.2f}s budget)", run(args.k, rerank=True))
+    print(f"   fell back to vector order on {reranker.fallbacks}/{len(QUERIES)} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,127 @@
+import json
+
 import requests
 
+from tracing import span
+
 
 class LLM:
     def __init__(self, model_name: str = "codellama:7b"):
         self.model_name = model_name
         self.api_url = "http://localhost:11434/api/generate"
+        self.tags_url = "http://localhost:11434/api/tags"
 
     def generate(self, prompt: str) -> str:
+        try:
+            data = self.generate_raw(prompt)
+            return data.get("response", "").strip()
+
+        except requests.exceptions.RequestException as e:
+            return f"[ERROR] LLM request failed: {e}"
+
+    def generate_raw(self, prompt: str, context: list | None = None, on_token=None, options: dict | None = None, should_stop=None) -> dict:
+        """
+        Send a prompt to Ollama and return the full JSON response.
+
+        Unlike generate(), request errors are raised so callers can
+        fall back to another model. The returned dict also carries
+        Ollama's timing fields (total_duration, prompt_eval_count, ...)
+        and the session `context` tokens, which can be passed back in
+        to continue the conversation.
+
+        With `on_token`, the response is streamed and each text chunk is
+        passed to it as it arrives; the return value is the same.
+
+        `options` are Ollama generation options (num_predict, stop,
+        temperature, ...). `should_stop` is called with the response so
+        far after each streamed chunk; when it returns True the stream
+        is closed, which makes Ollama stop generating. Such responses
+        have done_reason "early_stop" and no final timing fields.
+        """
+        stream = on_token is not None or should_stop is not None
         payload = {
             "model": self.model_name,
             "prompt": prompt,
-            "stream": False
+            "stream": stream
         }
+        if context:
+            payload["context"] = context
+        if options:
+            payload["options"] = options
 
+        with span(
+            "llm.generate",
+            **{
+                "llm.model": self.model_name,
+                "llm.prompt_chars": len(prompt),
+                "llm.stream": stream,
+                "llm.num_predict": (options or {}).get("num_predict"),
+                "llm.context_tokens": len(context) if context else 0,
+            },
+        ) as current:
+            if not stream:
+                response = requests.post(self.api_url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+            else:
+                with requests.post(self.api_url, json=payload, stream=True) as response:
+                    response.raise_for_status()
+                    data = self._collect_stream(response, on_token, should_stop)
+
+            current.set_attributes(_span_stats(data))
+            return data
+
+    def _collect_stream(self, response, on_token=None, should_stop=None) -> dict:
+        """Join streamed chunks into one response dict (final chunk carries stats)"""
+        text = ""
+        chunks = 0
+        data = {}
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            piece = data.get("response", "")
+            if piece:
+                text += piece
+                chunks += 1
+                if on_token:
+                    on_token(piece)
+            if data.get("done"):
+                break
+            if should_stop and piece and should_stop(text):
+                # Leaving the `with` block closes the connection
+                data = {"done": True, "done_reason": "early_stop", "eval_count": chunks}
+                break
+
+        data["response"] = text
+        return data
+
+    def is_available(self, timeout: float = 2.0) -> bool | None:
+        """
+        Check that this model is pulled in Ollama.
+
+        Returns None when Ollama itself cannot be reached, so callers
+        can tell a missing model from a server that is not running.
+        """
         try:
-            response = requests.post(self.api_url, json=payload)
+            response = requests.get(self.tags_url, timeout=timeout)
             response.raise_for_status()
-            data = response.json()
-            return data.get("response", "").strip()
+            models = response.json().get("models", [])
+        except (requests.exceptions.RequestException, ValueError):
+            return None
 
-        except requests.exceptions.RequestException as e:
-            return f"[ERROR] LLM request failed: {e}"
+        # Ollama lists untagged pulls as "name:latest"
+        name = self.model_name if ":" in self.model_name else self.model_name + ":latest"
+        return any(m.get("name") == name for m in models)
+
+
+def _span_stats(data: dict) -> dict:
+    """Ollama token counts and durations (ms) as span attributes"""
+    stats = {}
+    for field in ("prompt_eval_count", "eval_count"):
+        if data.get(field) is not None:
+            stats[f"llm.{field}"] = data[field]
+    for field in ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration"):
+        if data.get(field) is not None:
+            stats[f"llm.{field}_ms"] = data[field] / 1e6
+    return stats
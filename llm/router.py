@@ -0,0 +1,318 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import requests
+
+from agent.profiling import percentile
+from llm.model import LLM
+
+# Per-call latency log, used to tune the routing table from real sessions
+LATENCY_LOG_PATH = Path(__file__).parent.parent / "data" / "router_latency.jsonl"
+
+# Named model tiers (override with DJANGO_AGENT_SMALL_MODEL / DJANGO_AGENT_LARGE_MODEL)
+MODELS = {
+    "small": os.environ.get("DJANGO_AGENT_SMALL_MODEL", "qwen2.5-coder:1.5b"),
+    "large": os.environ.get("DJANGO_AGENT_LARGE_MODEL", "codellama:7b"),
+}
+
+# Preference order per agent mode; later entries are fallbacks
+ROUTES = {
+    "ANSWER": ["small", "large"],
+    "ACTION": ["large", "small"],
+}
+
+# Ollama generation options per agent mode. ACTION output is a code
+# block plus a short explanation, so it gets a tight length cap and a
+# low temperature. ANSWER explanations can run long; their cap is only
+# a runaway guard (hitting it is reported to the user). Both stop if
+# the model starts inventing a next turn.
+GENERATION_OPTIONS = {
+    "ANSWER": {"num_predict": 4096, "temperature": 0.4, "stop": ["\nUser Request:", "[INST]"]},
+    "ACTION": {"num_predict": 512, "temperature": 0.1, "stop": ["\nUser Request:", "[INST]"]},
+}
+
+# ANSWER prompts bigger than this (estimated tokens) go to the large model
+SMALL_MODEL_MAX_PROMPT_TOKENS = 3000
+
+# How long a failing model is skipped before it is tried again (seconds)
+UNAVAILABLE_COOLDOWN = 60.0
+
+# Timing/count fields Ollama returns with every response, and why it stopped
+OLLAMA_STAT_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+    "done_reason",
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class ModelStats:
+    """
+    Rolling latency statistics for one model.
+
+    Ollama reports its own prompt and generation durations, so the
+    per-token rates below come from measured data rather than guesses.
+    """
+
+    def __init__(self, window: int = 50):
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.unavailable_until = 0.0
+        self.missing = False      # model not pulled in Ollama; never tried
+        self.prompt_rate = None   # seconds per prompt token
+        self.eval_rate = None     # seconds per generated token
+        self.eval_tokens = None   # typical generated token count
+
+    def record(self, seconds: float, data: dict):
+        self.calls += 1
+        self.latencies.append(seconds)
+
+        prompt_count = data.get("prompt_eval_count")
+        prompt_ns = data.get("prompt_eval_duration")
+        if prompt_count and prompt_ns:
+            self.prompt_rate = _ewma(self.prompt_rate, prompt_ns / 1e9 / prompt_count)
+
+        eval_count = data.get("eval_count")
+        eval_ns = data.get("eval_duration")
+        if eval_count and eval_ns:
+            self.eval_rate = _ewma(self.eval_rate, eval_ns / 1e9 / eval_count)
+            self.eval_tokens = _ewma(self.eval_tokens, eval_count)
+
+    def record_failure(self):
+        self.failures += 1
+        self.unavailable_until = time.monotonic() + UNAVAILABLE_COOLDOWN
+
+    def is_available(self) -> bool:
+        return not self.missing and time.monotonic() >= self.unavailable_until
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        return percentile(self.latencies, q)
+
+    def predict(self, prompt_tokens: int) -> float | None:
+        """Predicted latency in seconds, or None without enough data"""
+        if self.prompt_rate is None or self.eval_rate is None:
+            return self.percentile(50)
+        return prompt_tokens * self.prompt_rate + self.eval_tokens * self.eval_rate
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "prompt_tokens_per_s": 1 / self.prompt_rate if self.prompt_rate else None,
+            "eval_tokens_per_s": 1 / self.eval_rate if self.eval_rate else None,
+        }
+
+
+class ModelRouter:
+    """
+    Route each request to a small or a large model.
+
+    - ANSWER mode prefers the small model, ACTION mode the large one
+    - Oversized ANSWER prompts are promoted to the large model
+    - With a latency budget, a model predicted to blow the budget is
+      skipped in favour of one that fits
+    - A model that errors is put on cooldown and the next one is tried
+    - Models that are not pulled in Ollama (checked once at startup, or
+      reported missing by a request) are skipped until restart
+    """
+
+    def __init__(
+        self,
+        models: dict | None = None,
+        routes: dict | None = None,
+        latency_budget: float | None = None,
+        log_path: Path | None = LATENCY_LOG_PATH,
+        check_models: bool = True,
+    ):
+        models = models or MODELS
+        self.routes = routes or ROUTES
+        self.latency_budget = latency_budget
+        self.log_path = log_path
+        self.llms = {tier: LLM(name) for tier, name in models.items()}
+        self.stats = {tier: ModelStats() for tier in models}
+        self._lock = threading.Lock()
+        if check_models:
+            self.check_models()
+
+    def check_models(self) -> list[str]:
+        """
+        Mark tiers whose model is not pulled in Ollama as missing, so
+        requests do not pay for a failing call to them. Nothing is
+        marked when Ollama cannot be reached.
+
+        Returns:
+            Names of the missing models
+        """
+        missing = []
+        for tier, llm in self.llms.items():
+            available = llm.is_available()
+            if available is None:
+                break  # Ollama is not running; requests report that themselves
+            with self._lock:
+                self.stats[tier].missing = not available
+            if not available:
+                missing.append(llm.model_name)
+                print(f"⚠️  Warning: Model {llm.model_name} is not pulled in Ollama; routing around it", file=sys.stderr)
+        return missing
+
+    def choose(self, mode: str, prompt: str) -> list[str]:
+        """
+        Return model tiers in the order they should be tried.
+        """
+        order = list(self.routes.get(mode, self.routes["ACTION"]))
+        prompt_tokens = estimate_tokens(prompt)
+
+        if (
+            mode == "ANSWER"
+            and prompt_tokens > SMALL_MODEL_MAX_PROMPT_TOKENS
+            and "small" in order
+        ):
+            order.remove("small")
+            order.append("small")
+
+        if self.latency_budget is not None:
+            with self._lock:
+                predicted = {t: self.stats[t].predict(prompt_tokens) for t in order}
+            within = [t for t in order if predicted[t] is None or predicted[t] <= self.latency_budget]
+            order = within + [t for t in order if t not in within]
+
+        with self._lock:
+            available = [t for t in order if self.stats[t].is_available()]
+            pulled = [t for t in order if not self.stats[t].missing]
+        # When everything is on cooldown, still try in preference order
+        return available or pulled or order
+
+    def generate(
+        self,
+        prompt: str,
+        mode: str = "ACTION",
+        stats: dict | None = None,
+        context: list | None = None,
+        context_model: str | None = None,
+        followup_prompt: str | None = None,
+        on_token=None,
+        options: dict | None = None,
+        should_stop=None,
+    ) -> str:
+        """
+        Generate with the best available model for this mode.
+
+        Args:
+            prompt: Full prompt text
+            mode: ANSWER or ACTION
+            stats: Optional dict filled with the model used, Ollama's
+                raw timing fields (durations in nanoseconds) and the
+                returned session `context`
+            context: Ollama context tokens from an earlier turn
+            context_model: Model that produced `context`
+            followup_prompt: Shorter prompt to send together with
+                `context`; only used when the model picked for this mode
+                is context_model, otherwise the full prompt is sent
+            on_token: Optional callback streaming response text chunks
+            options: Ollama generation options (default: the mode's
+                GENERATION_OPTIONS)
+            should_stop: Optional callback given the response so far;
+                returning True ends generation early
+        """
+        if options is None:
+            options = GENERATION_OPTIONS.get(mode)
+        tiers = self.choose(mode, prompt)
+        errors = []
+
+        continue_on = None
+        if context and followup_prompt and self.llms[tiers[0]].model_name == context_model:
+            continue_on = tiers[0]
+
+        for tier in tiers:
+            llm = self.llms[tier]
+            start = time.perf_counter()
+            try:
+                if tier == continue_on:
+                    data = llm.generate_raw(
+                        followup_prompt, context=context, on_token=on_token, options=options, should_stop=should_stop
+                    )
+                else:
+                    data = llm.generate_raw(prompt, on_token=on_token, options=options, should_stop=should_stop)
+            except requests.exceptions.RequestException as e:
+                with self._lock:
+                    self.stats[tier].record_failure()
+                    # Ollama answers 404 for a model that is not pulled
+                    if getattr(e.response, "status_code", None) == 404:
+                        self.stats[tier].missing = True
+                errors.append(f"{llm.model_name}: {e}")
+                continue
+
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.stats[tier].record(seconds, data)
+            self._log(tier, mode, prompt, seconds, data)
+            if stats is not None:
+                stats["model"] = llm.model_name
+                stats.update({f: data[f] for f in OLLAMA_STAT_FIELDS if f in data})
+                stats["context"] = data.get("context")
+            return data.get("response", "").strip()
+
+        return "[ERROR] LLM request failed: " + "; ".join(errors)
+
+    def summary(self) -> dict:
+        """Per-model latency summary keyed by model name"""
+        with self._lock:
+            return {self.llms[t].model_name: s.summary() for t, s in self.stats.items()}
+
+    def format_summary(self) -> str:
+        """Per-model calls, failures and latency for the /profile report"""
+        lines = ["🧭 Models:"]
+        for name, row in self.summary().items():
+            line = f"   {name:<24} {row['calls']:4d} calls {row['failures']:3d} failed"
+            if row["p50"] is not None:
+                line += f"  p50 {row['p50'] * 1000:9.1f} ms  p95 {row['p95'] * 1000:9.1f} ms"
+            if row["eval_tokens_per_s"]:
+                line += f"  {row['eval_tokens_per_s']:.1f} tok/s"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _log(self, tier: str, mode: str, prompt: str, seconds: float, data: dict):
+        if self.log_path is None:
+            return
+        record = {
+            "ts": time.time(),
+            "model": self.llms[tier].model_name,
+            "mode": mode,
+            "prompt_tokens_est": estimate_tokens(prompt),
+            "latency_s": round(seconds, 4),
+            "prompt_eval_count": data.get("prompt_eval_count"),
+            "prompt_eval_duration": data.get("prompt_eval_duration"),
+            "eval_count": data.get("eval_count"),
+            "eval_duration": data.get("eval_duration"),
+            "done_reason": data.get("done_reason"),
+        }
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock, self.log_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+
+
+def _ewma(previous: float | None, value: float, alpha: float = 0.2) -> float:
+    if previous is None:
+        return value
+    return alpha * value + (1 - alpha) * previous
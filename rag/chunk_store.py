@@ -0,0 +1,131 @@
+import mmap
+import os
+import threading
+import zlib
+from array import array
+from pathlib import Path
+
+# Chunk stores live next to the vector DB, one directory per collection
+CHUNKS_PATH = Path(__file__).parent.parent / "data" / "vector_db" / "chunks"
+
+DATA_FILE = "chunks.bin"
+INDEX_FILE = "index.bin"
+
+
+class ChunkStoreWriter:
+    """
+    Write chunk texts as independently zlib-compressed frames in one
+    data file, plus an index of (offset, length) pairs.
+
+    Chunk ids are their positions ("0", "1", ...), matching the ids
+    stored in the vector index. Files are written under temporary names
+    and swapped in on close() so readers never see a partial store.
+    """
+
+    def __init__(self, directory: Path, level: int = 6):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.level = level
+        self._offsets = array("Q")
+        self._offset = 0
+        self._data = open(self.directory / (DATA_FILE + ".tmp"), "wb")
+        self.raw_bytes = 0
+
+    def add(self, text: str) -> str:
+        raw = text.encode("utf-8")
+        frame = zlib.compress(raw, self.level)
+        self._data.write(frame)
+        self._offsets.extend((self._offset, len(frame)))
+        self._offset += len(frame)
+        self.raw_bytes += len(raw)
+        return str(len(self._offsets) // 2 - 1)
+
+    def close(self) -> dict:
+        self._data.close()
+        with open(self.directory / (INDEX_FILE + ".tmp"), "wb") as f:
+            self._offsets.tofile(f)
+
+        os.replace(self.directory / (DATA_FILE + ".tmp"), self.directory / DATA_FILE)
+        os.replace(self.directory / (INDEX_FILE + ".tmp"), self.directory / INDEX_FILE)
+        return {
+            "chunks": len(self._offsets) // 2,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self._offset,
+        }
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped view of a chunk store.
+
+    The data file is mapped rather than read, so only the frames that
+    are actually fetched are paged in, and several agent processes on
+    one host share the same page cache.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        index_path = self.directory / INDEX_FILE
+        self.index_mtime_ns = index_path.stat().st_mtime_ns
+
+        self._offsets = array("Q")
+        with open(index_path, "rb") as f:
+            self._offsets.frombytes(f.read())
+
+        self._file = open(self.directory / DATA_FILE, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) // 2
+
+    def get(self, chunk_id: str) -> str:
+        i = int(chunk_id) * 2
+        offset, length = self._offsets[i], self._offsets[i + 1]
+        return zlib.decompress(self._map[offset:offset + length]).decode("utf-8")
+
+    def get_many(self, chunk_ids) -> list[str]:
+        return [self.get(chunk_id) for chunk_id in chunk_ids]
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def store_path(collection_name: str) -> Path:
+    return CHUNKS_PATH / collection_name
+
+
+def open_chunk_store(collection_name: str) -> ChunkStore | None:
+    """
+    Shared reader for a collection's chunk store, reopened when the
+    store has been rebuilt. Returns None if the collection has no
+    chunk store (older indexes keep text inside ChromaDB).
+    """
+    directory = store_path(collection_name)
+    try:
+        mtime_ns = (directory / INDEX_FILE).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _stores_lock:
+        store = _stores.get(collection_name)
+        if store is None or store.index_mtime_ns != mtime_ns:
+            # The old reader is left for in-flight queries to finish with
+            store = ChunkStore(directory)
+            _stores[collection_name] = store
+        return store
+
+
+def forget_chunk_store(collection_name: str):
+    """
+    Drop the shared reader for a deleted store. It is not closed, so
+    in-flight queries can finish with it.
+    """
+    with _stores_lock:
+        _stores.pop(collection_name, None)
@@ -0,0 +1,68 @@
+import numpy as np
+
+# Relevance/diversity trade-off: 1.0 ranks purely by relevance, 0.0
+# purely by dissimilarity to what is already selected
+MMR_LAMBDA = 0.7
+
+# At most this many chunks from one source file (None: no cap)
+MAX_PER_SOURCE = 2
+
+
+def mmr_select(relevance, embeddings, k: int, lambda_: float = MMR_LAMBDA, sources=None, max_per_source: int | None = MAX_PER_SOURCE) -> list[int]:
+    """
+    Maximal marginal relevance selection.
+
+    Picks candidates one at a time, each maximising
+        lambda_ * relevance - (1 - lambda_) * max similarity to the picks so far
+    so overlapping neighbour chunks from one file do not crowd out
+    other information.
+
+    Args:
+        relevance: Relevance score per candidate (higher is better)
+        embeddings: One embedding per candidate
+        k: Number of candidates to select
+        lambda_: Relevance/diversity weight (see MMR_LAMBDA)
+        sources: Optional source name per candidate, for the cap
+        max_per_source: Maximum picks per source
+
+    Returns:
+        Selected candidate indexes, in pick order (may be fewer than k
+        when the per-source cap rules the rest out)
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.maximum(norms, 1e-12)
+    similarity = vectors @ vectors.T
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+
+    if sources is not None and max_per_source is not None:
+        _, source_ids = np.unique(np.asarray(sources), return_inverse=True)
+        source_counts = np.zeros(source_ids.max() + 1, dtype=np.int32)
+    else:
+        source_ids = None
+
+    selected = []
+    while len(selected) < k and available.any():
+        scores = lambda_ * relevance - (1.0 - lambda_) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+
+        if source_ids is not None:
+            source = source_ids[best]
+            source_counts[source] += 1
+            if source_counts[source] >= max_per_source:
+                available[source_ids == source] = False
+
+    return selected
@@ -1,14 +1,91 @@
+import gc
+import threading
+import time
+
 from sentence_transformers import SentenceTransformer
 
+from rag.resources import rss_bytes
+
 _embedding_model = None
+_model_lock = threading.Lock()
+_last_used = 0.0
+_loaded_rss_delta = None
+
+# "float32" (default), "float16" or "int8" (dynamic quantization)
+_precision = "float32"
+
+def configure_embeddings(precision: str = "float32"):
+    """
+    Set the precision used the next time the model is loaded.
+
+    Reduced precision roughly halves (float16) or quarters (int8) the
+    memory held by the model's weights at a small cost in accuracy.
+    """
+    global _precision
+    if precision not in ("float32", "float16", "int8"):
+        raise ValueError(f"Unsupported embedding precision: {precision}")
+    _precision = precision
+
 
 def get_embedding_model():
-    global _embedding_model
+    global _embedding_model, _loaded_rss_delta
     if _embedding_model is None:
-        _embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+        # Batch mode prepares several requests at once; load only once
+        with _model_lock:
+            if _embedding_model is None:
+                before = rss_bytes()
+                _embedding_model = _reduce_precision(SentenceTransformer("all-MiniLM-L6-v2"))
+                after = rss_bytes()
+                _loaded_rss_delta = after - before if before and after else None
     return _embedding_model
 
 
 def embed_texts(texts):
+    global _last_used
     model = get_embedding_model()
+    _last_used = time.monotonic()
     return model.encode(texts)
+
+
+def unload_embedding_model(idle_seconds: float | None = None) -> bool:
+    """
+    Drop the cached model so its memory can be reclaimed; it is
+    reloaded lazily on the next embed_texts call.
+
+    With idle_seconds, only unload if unused for at least that long.
+    """
+    global _embedding_model, _loaded_rss_delta
+    with _model_lock:
+        if _embedding_model is None:
+            return False
+        if idle_seconds is not None and time.monotonic() - _last_used < idle_seconds:
+            return False
+        _embedding_model = None
+        _loaded_rss_delta = None
+    gc.collect()
+    return True
+
+
+def embedding_model_memory() -> dict:
+    """Weights size and RSS growth observed when the model was loaded"""
+    model = _embedding_model
+    if model is None:
+        return {"loaded": False}
+
+    weight_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    return {
+        "loaded": True,
+        "precision": _precision,
+        "weights_bytes": weight_bytes,
+        "rss_delta_bytes": _loaded_rss_delta,
+    }
+
+
+def _reduce_precision(model):
+    if _precision == "float16":
+        return model.half()
+    if _precision == "int8":
+        import torch
+
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from rag.chunk_store import CHUNKS_PATH, forget_chunk_store
+
+# Maps each logical collection (e.g. "django_docs") to the versioned
+# collection currently serving queries, plus the one it replaced:
+#   {"django_docs": {"active": "django_docs__v...", "previous": "..."}}
+ACTIVE_FILE = Path(__file__).parent.parent / "data" / "vector_db" / "active.json"
+
+VERSION_SEPARATOR = "__v"
+
+_pointer_lock = threading.Lock()
+_pointer_cache = (None, {})  # (mtime_ns, data)
+
+
+def new_version_name(logical: str) -> str:
+    """Name for a fresh build of a collection, sortable by build time"""
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+    return f"{logical}{VERSION_SEPARATOR}{stamp}"
+
+
+def _read_pointers() -> dict:
+    global _pointer_cache
+    try:
+        mtime_ns = ACTIVE_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+
+    cached_mtime, data = _pointer_cache
+    if cached_mtime != mtime_ns:
+        try:
+            data = json.loads(ACTIVE_FILE.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return data  # mid-write on a platform without atomic replace; keep the last good copy
+        _pointer_cache = (mtime_ns, data)
+    return data
+
+
+def active_collection(logical: str) -> str:
+    """
+    Collection currently serving `logical`. Checked on every query, so
+    running sessions follow a rebuild without restarting. Indexes built
+    before versioning keep using the unversioned name.
+    """
+    return _read_pointers().get(logical, {}).get("active", logical)
+
+
+def activate(logical: str, physical: str) -> str:
+    """
+    Atomically point `logical` at `physical`.
+
+    Returns:
+        The previously active collection
+    """
+    with _pointer_lock:
+        try:
+            data = json.loads(ACTIVE_FILE.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+
+        # Before the first versioned build, the unversioned collection is live
+        previous = data.get(logical, {}).get("active", logical)
+        data[logical] = {"active": physical, "previous": previous}
+
+        ACTIVE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = ACTIVE_FILE.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp_path, ACTIVE_FILE)
+        return previous
+
+
+def collect_garbage(client, logical: str) -> list[str]:
+    """
+    Delete old versions of a collection and their chunk stores.
+
+    The active and the previous version are kept: queries that looked
+    up the pointer just before the swap may still be reading the
+    previous one.
+
+    Returns:
+        Names of the deleted versions
+    """
+    entry = _read_pointers().get(logical, {})
+    keep = {entry.get("active"), entry.get("previous")}
+    if entry.get("active") is None:
+        return []  # never switched to versioning; nothing is stale
+
+    version_pattern = re.compile(re.escape(logical) + "(" + re.escape(VERSION_SEPARATOR) + ".+)?$")
+
+    stale = set()
+    for collection in client.list_collections():
+        name = getattr(collection, "name", collection)  # objects or names depending on chromadb version
+        if version_pattern.match(name) and name not in keep:
+            stale.add(name)
+    if CHUNKS_PATH.exists():
+        for directory in CHUNKS_PATH.iterdir():
+            if version_pattern.match(directory.name) and directory.name not in keep:
+                stale.add(directory.name)
+
+    deleted = []
+    for name in sorted(stale):
+        try:
+            client.delete_collection(name=name)
+        except Exception:
+            pass  # only a chunk store was left over
+        forget_chunk_store(name)
+        try:
+            shutil.rmtree(CHUNKS_PATH / name)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Still mapped by a reader on Windows; retried by the next rebuild
+            print(f"⚠️  Warning: Could not remove old chunk store {name}: {e}")
+        deleted.append(name)
+    return deleted
@@ -4,9 +4,13 @@ from pathlib import Path
 DOCS_PATH = Path(__file__).parent.parent / "data" / "django_docs"
 
 
-def load_documents():
+def load_documents(docs_path: Path = DOCS_PATH):
     """
-    Load all .txt files from the Django documentation directory.
+    Load all .txt files from the Django documentation directory (or
+    another directory, e.g. a project's own docs).
+    
+    Args:
+        docs_path: Directory containing the .txt files
     
     Returns:
         List of document dictionaries with 'text' and 'metadata'
@@ -14,14 +18,14 @@ def load_documents():
     documents = []
     
     # Verify path exists
-    if not DOCS_PATH.exists():
-        raise FileNotFoundError(f"Documentation path not found: {DOCS_PATH}")
+    if not docs_path.exists():
+        raise FileNotFoundError(f"Documentation path not found: {docs_path}")
     
     # Find all .txt files
-    txt_files = list(DOCS_PATH.glob("*.txt"))
+    txt_files = list(docs_path.glob("*.txt"))
     
     if len(txt_files) == 0:
-        raise FileNotFoundError(f"No .txt files found in: {DOCS_PATH}")
+        raise FileNotFoundError(f"No .txt files found in: {docs_path}")
     
     print(f"   Found {len(txt_files)} .txt files")
     
@@ -0,0 +1,188 @@
+import gc
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Small CPU cross-encoder (~22M parameters) trained for passage ranking
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# First-stage candidates handed to the reranker
+RERANK_POOL = 20
+
+# Wall-clock budget for scoring one query; when it would be exceeded
+# the first-stage (vector distance) order is used instead
+RERANK_BUDGET_S = 0.3
+
+# (query, chunk) pairs scored per model call
+RERANK_BATCH_SIZE = 8
+
+# Cached (query, chunk) scores, least recently used evicted first
+SCORE_CACHE_SIZE = 4096
+
+_enabled = False
+_reranker = None
+
+
+class Reranker:
+    """
+    Second-stage reranking with a cross-encoder.
+
+    - The model loads in a background thread on first use; queries fall
+      back to first-stage order until it is ready (or call warm_up())
+    - Pairs are scored in batches, and scoring stops before a batch
+      that is predicted to overrun the budget. The per-pair cost is
+      measured when the model loads, so even the first batch is
+      checked, and the prediction uses the slower of the recent
+      average and the last batch
+    - Scores are cached per (query, chunk key), so repeated or
+      overlapping queries only score new chunks
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, budget_s: float = RERANK_BUDGET_S, batch_size: int = RERANK_BATCH_SIZE, cache_size: int = SCORE_CACHE_SIZE):
+        self.model_name = model_name
+        self.budget_s = budget_s
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.fallbacks = 0
+        self._model = None
+        self._loading = None
+        self._load_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pair_seconds = 0.0  # EWMA of the scoring time per pair
+        self._last_pair_seconds = 0.0
+        self._last_used = 0.0
+
+    # ---------------- MODEL ---------------- #
+
+    def warm_up(self):
+        """Load the model now (blocking)"""
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                model = CrossEncoder(self.model_name, device="cpu")
+                self._calibrate(model)
+                self._model = model
+        return self._model
+
+    def _calibrate(self, model):
+        """Time one full batch of chunk-sized pairs to seed the budget check"""
+        pairs = [("How do I add a field to a model?", "Django model field reference. " * 40)] * self.batch_size
+        began = time.perf_counter()
+        model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        self._pair_seconds = self._last_pair_seconds = (time.perf_counter() - began) / len(pairs)
+
+    def is_ready(self) -> bool:
+        if self._model is not None:
+            return True
+        with self._load_lock:
+            if self._loading is None or not self._loading.is_alive():
+                self._loading = threading.Thread(target=self._load_quietly, daemon=True)
+                self._loading.start()
+        return False
+
+    def unload(self, idle_seconds: float | None = None) -> bool:
+        """Drop the model (reloaded on demand); with idle_seconds, only if unused that long"""
+        with self._load_lock:
+            if self._model is None:
+                return False
+            if idle_seconds is not None and time.monotonic() - self._last_used < idle_seconds:
+                return False
+            self._model = None
+        gc.collect()
+        return True
+
+    def _load_quietly(self):
+        try:
+            self.warm_up()
+        except Exception as e:
+            print(f"⚠️  Warning: Could not load reranker {self.model_name}: {e}", file=sys.stderr)
+
+    # ---------------- SCORING ---------------- #
+
+    def rerank(self, query: str, texts: list[str], keys: list | None = None, started: float | None = None) -> list[int] | None:
+        """
+        Order candidates by cross-encoder relevance.
+
+        Args:
+            query: User's query string
+            texts: Candidate chunk texts, in first-stage order
+            keys: Stable cache keys for the chunks (default: the texts)
+            started: perf_counter() time the budget counts from (default:
+                now); pass it to include work done before scoring, such
+                as fetching the chunk texts
+
+        Returns:
+            Candidate indexes, best first, or None if the model is not
+            ready or the budget ran out (keep first-stage order)
+        """
+        if not texts:
+            return []
+        if not self.is_ready():
+            self.fallbacks += 1
+            return None
+
+        deadline = (started if started is not None else time.perf_counter()) + self.budget_s
+        keys = keys or texts
+        self._last_used = time.monotonic()
+
+        with self._cache_lock:
+            scores = []
+            for key in keys:
+                score = self._cache.get((query, key))
+                if score is not None:
+                    self._cache.move_to_end((query, key))  # least recently used is evicted first
+                scores.append(score)
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            predicted = max(self._pair_seconds, self._last_pair_seconds) * len(batch)
+            if time.perf_counter() + predicted > deadline:
+                self.fallbacks += 1
+                return None
+
+            began = time.perf_counter()
+            batch_scores = self._model.predict(
+                [(query, texts[i]) for i in batch], batch_size=len(batch), show_progress_bar=False
+            )
+            per_pair = (time.perf_counter() - began) / len(batch)
+            self._last_pair_seconds = per_pair
+            self._pair_seconds = per_pair if not self._pair_seconds else 0.8 * self._pair_seconds + 0.2 * per_pair
+
+            with self._cache_lock:
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                    self._cache[(query, keys[i])] = scores[i]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return sorted(range(len(texts)), key=lambda i: scores[i], reverse=True)
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+
+def enable_reranking(budget_s: float = RERANK_BUDGET_S, warm_up: bool = False) -> Reranker:
+    """Turn on second-stage reranking for retrieve_context"""
+    global _enabled
+    reranker = get_reranker()
+    reranker.budget_s = budget_s
+    _enabled = True
+    if warm_up:
+        reranker.warm_up()
+    return reranker
+
+
+def reranking_enabled() -> bool:
+    return _enabled
+
+
+def get_reranker() -> Reranker:
+    global _reranker
+    if _reranker is None:
+        _reranker = Reranker()
+    return _reranker
@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+
+
+def rss_bytes() -> int | None:
+    """
+    Current resident set size of this process, or None if unknown.
+
+    Uses psutil when installed, otherwise the working set from
+    GetProcessMemoryInfo on Windows, or /proc and resource elsewhere.
+    """
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    if sys.platform == "win32":
+        return _windows_working_set()
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Peak, not current; kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def _windows_working_set() -> int | None:
+    """Working set of this process via GetProcessMemoryInfo (no psutil needed)"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        kernel32.K32GetProcessMemoryInfo.argtypes = [
+            wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD
+        ]
+        kernel32.K32GetProcessMemoryInfo.restype = wintypes.BOOL
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+class IdleUnloader:
+    """
+    Background thread that unloads the embedding model (and reranker)
+    and closes the vector store after `idle_seconds` without use. All
+    are reloaded lazily on the next retrieval.
+    """
+
+    def __init__(self, idle_seconds: float = 300, check_interval: float | None = None):
+        self.idle_seconds = idle_seconds
+        self.check_interval = check_interval or max(1.0, idle_seconds / 4)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def unload_idle(self) -> list[str]:
+        """Unload whatever has been idle long enough; returns what was unloaded"""
+        from rag.embeddings import unload_embedding_model
+        from rag.reranker import get_reranker
+        from rag.retriever import close_client
+
+        unloaded = []
+        if unload_embedding_model(idle_seconds=self.idle_seconds):
+            unloaded.append("embedding_model")
+        if close_client(idle_seconds=self.idle_seconds):
+            unloaded.append("vector_store")
+        if get_reranker().unload(idle_seconds=self.idle_seconds):
+            unloaded.append("reranker")
+        return unloaded
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.unload_idle()
+            except Exception as e:
+                print(f"⚠️  Warning: Idle unload failed: {e}", file=sys.stderr)
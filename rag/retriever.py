@@ -1,46 +1,302 @@
+import gc
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
 import chromadb
 from rag.embeddings import embed_texts
+from rag.chunk_store import open_chunk_store
+from rag.index_versions import active_collection
+from rag.diversity import mmr_select
+from rag.reranker import RERANK_POOL, get_reranker, reranking_enabled
+from rag.resources import rss_bytes
+from tracing import span
 from pathlib import Path
 
 # Use relative path from the rag module
 CHROMA_PATH = Path(__file__).parent.parent / "data" / "vector_db"
 
+# Shared Django documentation; workspaces may add their own collection
+DOCS_COLLECTION = "django_docs"
+
+# Adaptive retrieval (cosine distance: 0 = identical, 1 = unrelated)
+CANDIDATE_POOL = 12     # candidates fetched before selection
+MIN_K = 1               # keep at least this many relevant chunks
+MAX_K = 6               # never keep more than this
+MAX_DISTANCE = 0.6      # candidates further away than this are irrelevant
+MAX_GAP = 0.08          # a jump this large between neighbours ends the list
+
+_client = None
+_client_lock = threading.Lock()
+_client_rss_delta = None
+_in_flight = 0
+_last_used = 0.0
+
+
+def get_client():
+    """
+    Return a shared ChromaDB client, created on first use.
+
+    Opening the persistent client per query is slow and, with batch
+    mode retrieving for several requests at once, wasteful.
+    """
+    global _client, _client_rss_delta
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                before = rss_bytes()
+                _client = chromadb.PersistentClient(path=str(CHROMA_PATH))
+                after = rss_bytes()
+                _client_rss_delta = after - before if before and after else None
+    return _client
+
+
+def close_client(idle_seconds: float | None = None) -> bool:
+    """
+    Release the shared client (reopened lazily on the next query).
+
+    Never closes while a query is running; with idle_seconds, only
+    closes if unused for at least that long.
+    """
+    global _client, _client_rss_delta
+    with _client_lock:
+        if _client is None or _in_flight:
+            return False
+        if idle_seconds is not None and time.monotonic() - _last_used < idle_seconds:
+            return False
+        _client.clear_system_cache()
+        _client = None
+        _client_rss_delta = None
+    gc.collect()
+    return True
+
+
+def vector_store_memory() -> dict:
+    """RSS growth observed when the client was opened"""
+    if _client is None:
+        return {"loaded": False}
+    return {"loaded": True, "rss_delta_bytes": _client_rss_delta}
+
+
+@contextmanager
+def _using_client():
+    global _in_flight, _last_used
+    with _client_lock:
+        _in_flight += 1
+    try:
+        yield get_client()
+    finally:
+        with _client_lock:
+            _in_flight -= 1
+            _last_used = time.monotonic()
 
-def retrieve_context(query, k=4):
+
+def select_adaptive(distances, min_k=MIN_K, max_k=MAX_K, max_distance=MAX_DISTANCE, max_gap=MAX_GAP) -> int:
+    """
+    Decide how many of the (ascending) candidate distances to keep.
+
+    - Candidates beyond max_distance are never kept; if none are within
+      it, nothing is kept at all
+    - The list is cut at the first gap larger than max_gap between
+      neighbouring candidates (a drop-off in relevance)
+    - The result is kept within [min_k, max_k], but never includes an
+      irrelevant candidate just to reach min_k
+    """
+    relevant = 0
+    for distance in distances:
+        if distance > max_distance:
+            break
+        relevant += 1
+    if relevant == 0:
+        return 0
+
+    cut = relevant
+    for i in range(1, relevant):
+        if distances[i] - distances[i - 1] > max_gap:
+            cut = i
+            break
+
+    return min(max(cut, min_k), relevant, max_k)
+
+
+def retrieve_context(query, k=None, timings=None, collections=None, rerank=None, diversify=True):
     """
     Retrieve relevant context from the vector database.
+
+    See retrieve_candidates for the arguments.
+
+    Returns:
+        tuple: (combined_context_string, list_of_sources)
+    """
+    candidates = retrieve_candidates(
+        query, k=k, timings=timings, collections=collections, rerank=rerank, diversify=diversify
+    )
+    contexts = [c["text"] for c in candidates]
+    sources = {c["source"] for c in candidates}
+
+    return "\n\n".join(contexts), list(sources)
+
+
+def retrieve_candidates(query, k=None, timings=None, collections=None, rerank=None, diversify=True) -> list[dict]:
+    """
+    Ranked chunks for a query, best first.
     
     Args:
         query: User's query string
-        k: Number of results to retrieve
+        k: Number of results to retrieve; None selects adaptively from
+            a candidate pool by distance threshold and gap detection
+            (see select_adaptive), possibly returning nothing; reranking
+            and diversification then only work within the kept
+            candidates, so they may return fewer but never more
+        timings: Optional dict filled with 'embed', 'query', 'fetch'
+            and (when used) 'rerank' and 'diversify' seconds
+        collections: Collections to search (default: the Django docs);
+            candidates from all of them are ranked together
+        rerank: Rerank a wider first-stage pool with the cross-encoder
+            before taking the top results (default: on if
+            enable_reranking() was called); falls back to first-stage
+            order when over its latency budget
+        diversify: Choose the kept chunks by maximal marginal relevance
+            with a per-source cap (see rag.diversity) from a pool of at
+            least CANDIDATE_POOL, instead of taking the top ones, so
+            near-duplicate neighbours are skipped
     
     Returns:
-        tuple: (combined_context_string, list_of_sources)
+        list of dicts with 'collection', 'id', 'source', 'distance'
+        and 'text'
     """
-    # Create persistent client
-    client = chromadb.PersistentClient(
-        path=str(CHROMA_PATH)
-    )
+    collections = collections or [DOCS_COLLECTION]
+    if rerank is None:
+        rerank = reranking_enabled()
+    n_results = CANDIDATE_POOL if k is None else k
+    if diversify:
+        # MMR needs more candidates than it keeps to have anything to choose from
+        n_results = max(n_results, CANDIDATE_POOL)
+    if rerank:
+        n_results = max(n_results, RERANK_POOL)
 
-    try:
-        collection = client.get_collection("django_docs")
-    except Exception as e:
-        print(f"⚠️  Warning: Vector database not found. Run RAG setup first.")
-        print(f"   Error: {e}")
-        return "", []
+    with span("rag.retrieve", **{"rag.k": k, "rag.adaptive": k is None, "rag.collections": len(collections), "rag.rerank": rerank}) as current, _using_client() as client:
+        # Resolve each collection to its active version (switched
+        # atomically by rebuilds) once per query
+        found = []
+        for name in collections:
+            try:
+                version = active_collection(name)
+                found.append((version, client.get_collection(version)))
+            except Exception as e:
+                if name == DOCS_COLLECTION:
+                    print(f"⚠️  Warning: Vector database not found. Run RAG setup first.", file=sys.stderr)
+                else:
+                    print(f"⚠️  Warning: Doc collection '{name}' not found.", file=sys.stderr)
+                print(f"   Error: {e}", file=sys.stderr)
+        if not found:
+            return []
 
-    query_embedding = embed_texts([query])[0]
+        start = time.perf_counter()
+        with span("rag.embed"):
+            query_embedding = embed_texts([query])[0]
+        embedded = time.perf_counter()
 
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=k
-    )
+        candidates = []
+        with span("rag.query"):
+            for name, collection in found:
+                # Text lives in the chunk store when there is one; only ids
+                # and metadata come back from the vector index
+                chunk_store = open_chunk_store(name)
+                include = ["metadatas", "distances"] if chunk_store else ["documents", "metadatas", "distances"]
+                if diversify:
+                    include.append("embeddings")
+
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    include=include
+                )
+
+                ids = results["ids"][0]
+                documents = results["documents"][0] if not chunk_store else [None] * len(ids)
+                embeddings = results["embeddings"][0] if diversify else [None] * len(ids)
+                for chunk_id, meta, distance, doc, embedding in zip(
+                    ids, results["metadatas"][0], results["distances"][0], documents, embeddings
+                ):
+                    candidates.append({
+                        "collection": name,
+                        "id": chunk_id,
+                        "source": meta["source"],
+                        "distance": distance,
+                        "text": doc,
+                        "store": chunk_store,
+                        "embedding": embedding,
+                    })
+
+        candidates.sort(key=lambda c: c["distance"])
+        if k is None:
+            keep = select_adaptive([c["distance"] for c in candidates])
+            # Reranking and MMR only reorder and thin out what the gap cut
+            # kept; they never bring back a candidate it rejected
+            candidates = candidates[:keep]
+        else:
+            keep = min(k, len(candidates))
+        current.set_attribute("rag.results", keep)
+    queried = time.perf_counter()
+
+    reranked = queried
+    order = None
+    if rerank and keep:
+        pool = candidates[:RERANK_POOL]
+        with span("rag.rerank", **{"rag.rerank_pool": len(pool)}) as rerank_span:
+            # Decompressing the pool's text counts against the budget
+            _fetch_text(pool)
+            order = get_reranker().rerank(
+                query,
+                [c["text"] for c in pool],
+                [f"{c['collection']}:{c['id']}" for c in pool],
+                started=queried,
+            )
+            rerank_span.set_attribute("rag.rerank_fallback", order is None)
+        if order is not None:
+            candidates = [pool[i] for i in order]
+        reranked = time.perf_counter()
+
+    diversified = reranked
+    if diversify and keep and len(candidates) > 1:
+        with span("rag.diversify", **{"rag.mmr_pool": len(candidates)}):
+            if order is not None:
+                # Cross-encoder scores are not on the cosine scale; use rank
+                relevance = [1 - i / len(candidates) for i in range(len(candidates))]
+            else:
+                relevance = [1 - c["distance"] for c in candidates]
+            picks = mmr_select(
+                relevance,
+                [c["embedding"] for c in candidates],
+                keep,
+                sources=[c["source"] for c in candidates],
+            )
+        candidates = [candidates[i] for i in picks]
+        diversified = time.perf_counter()
+    else:
+        candidates = candidates[:keep]
+
+    with span("rag.fetch_text"):
+        _fetch_text(candidates)
+    for c in candidates:
+        del c["store"], c["embedding"]
+
+    if timings is not None:
+        timings["embed"] = embedded - start
+        timings["query"] = queried - embedded
+        if rerank:
+            timings["rerank"] = reranked - queried
+        if diversify:
+            timings["diversify"] = diversified - reranked
+        timings["fetch"] = time.perf_counter() - diversified
 
-    contexts = []
-    sources = set()
+    return candidates
 
-    for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
-        contexts.append(doc)
-        sources.add(meta["source"])
 
-    return "\n\n".join(contexts), list(sources)
\ No newline at end of file
+def _fetch_text(candidates):
+    """Fill in chunk text for candidates whose text is in a chunk store"""
+    for c in candidates:
+        if c["text"] is None:
+            c["text"] = c["store"].get(c["id"])
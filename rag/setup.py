@@ -4,12 +4,17 @@ from rag.vector_store import build_vector_store
 from pathlib import Path
 
 
-def setup_rag():
+def setup_rag(docs_path: Path | None = None, collection_name: str = "django_docs"):
     """
     Initialize the RAG system by:
     1. Loading Django documentation files
     2. Splitting into chunks
     3. Building vector store with embeddings
+
+    Args:
+        docs_path: Directory of .txt files (default: data/django_docs)
+        collection_name: Collection to build (workspaces use their own
+            for project docs)
     """
     print("\n" + "="*60)
     print("🚀 INITIALIZING RAG SYSTEM")
@@ -18,7 +23,7 @@ def setup_rag():
     # Step 1: Load documents
     print("📂 Step 1: Loading Django documentation files...")
     try:
-        documents = load_documents()
+        documents = load_documents(Path(docs_path)) if docs_path else load_documents()
         print(f"   ✅ Loaded {len(documents)} documents")
         
         if len(documents) == 0:
@@ -47,7 +52,7 @@ def setup_rag():
     # Step 3: Build vector store
     print("\n🔮 Step 3: Building vector store (this may take a few minutes)...")
     try:
-        doc_count = build_vector_store(chunks)
+        doc_count = build_vector_store(chunks, collection_name)
         print(f"   ✅ Vector store created successfully!")
         
     except Exception as e:
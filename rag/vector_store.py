@@ -1,18 +1,32 @@
 import chromadb
 from chromadb.config import Settings
 from rag.embeddings import embed_texts
+from rag.chunk_store import ChunkStore, ChunkStoreWriter, store_path
+from rag.index_versions import activate, collect_garbage, new_version_name
 from pathlib import Path
+import shutil
 
 # Use relative path from the rag module
 CHROMA_PATH = Path(__file__).parent.parent / "data" / "vector_db"
 
 
-def build_vector_store(chunks):
+def build_vector_store(chunks, collection_name: str = "django_docs"):
     """
     Build ChromaDB vector store from document chunks.
+
+    Chunk text goes to a compressed chunk store (see rag.chunk_store);
+    the collection itself only keeps ids, vectors and the source name.
+
+    The build goes into a new versioned collection and chunk store while
+    the current version keeps serving queries. Only after a retrieval
+    smoke test passes is the active-version pointer switched (see
+    rag.index_versions); versions older than the previous one are then
+    deleted.
     
     Args:
         chunks: List of chunk dictionaries with 'text' and 'metadata'
+        collection_name: Collection to (re)build, e.g. a workspace's
+            project doc collection
     """
     # Ensure directory exists
     CHROMA_PATH.mkdir(parents=True, exist_ok=True)
@@ -24,22 +38,49 @@ def build_vector_store(chunks):
         path=str(CHROMA_PATH)
     )
 
-    # Delete existing collection if it exists
-    try:
-        client.delete_collection(name="django_docs")
-        print(f"   Deleted existing collection")
-    except:
-        pass
+    version = new_version_name(collection_name)
+    print(f"   Building new version: {version}")
 
     # Create new collection with explicit distance function
     collection = client.get_or_create_collection(
-        name="django_docs",
+        name=version,
         metadata={"hnsw:space": "cosine"}
     )
 
+    try:
+        final_count = _fill_collection(collection, store_path(version), chunks)
+
+        print(f"   Smoke-testing retrieval...")
+        _smoke_test(collection, store_path(version), chunks)
+    except Exception:
+        _discard_version(client, version)
+        raise
+
+    previous = activate(collection_name, version)
+    print(f"   ✅ Active version: {version} (was {previous})")
+
+    deleted = collect_garbage(client, collection_name)
+    if deleted:
+        print(f"   Removed old versions: {', '.join(deleted)}")
+
+    print(f"   ✅ Final collection count: {final_count} documents")
+    
+    return final_count
+
+
+def _fill_collection(collection, chunk_dir: Path, chunks) -> int:
     # Extract data
     texts = [c["text"] for c in chunks]
-    metadatas = [c["metadata"] for c in chunks]
+    metadatas = [{"source": c["metadata"]["source"]} for c in chunks]
+
+    print(f"   Writing compressed chunk store...")
+    writer = ChunkStoreWriter(chunk_dir)
+    ids = [writer.add(text) for text in texts]
+    store_stats = writer.close()
+    print(
+        f"   Chunk text: {store_stats['raw_bytes']:,} bytes -> "
+        f"{store_stats['stored_bytes']:,} bytes compressed"
+    )
     
     print(f"   Generating embeddings for {len(texts)} chunks...")
     
@@ -54,17 +95,44 @@ def build_vector_store(chunks):
         end_idx = min(i + batch_size, len(texts))
         
         collection.add(
-            documents=texts[i:end_idx],
             metadatas=metadatas[i:end_idx],
             embeddings=embeddings[i:end_idx],
-            ids=[str(j) for j in range(i, end_idx)]
+            ids=ids[i:end_idx]
         )
         
         print(f"   Stored {end_idx}/{len(texts)} chunks")
-    
-    # Verify collection was created
-    final_count = collection.count()
-    print(f"   Persisting to disk...")
-    print(f"   ✅ Final collection count: {final_count} documents")
-    
-    return final_count
\ No newline at end of file
+
+    return collection.count()
+
+
+def _smoke_test(collection, chunk_dir: Path, chunks, samples: int = 3):
+    """
+    Query the new version with a few of its own chunks: each must come
+    back as the top hit with readable text. Raises RuntimeError if not.
+    """
+    count = collection.count()
+    if count != len(chunks) or count == 0:
+        raise RuntimeError(f"Smoke test failed: expected {len(chunks)} documents, found {count}")
+
+    store = ChunkStore(chunk_dir)
+    try:
+        step = max(1, len(chunks) // samples)
+        for i in range(0, len(chunks), step)[:samples]:
+            results = collection.query(
+                query_embeddings=[embed_texts([chunks[i]["text"]])[0]],
+                n_results=1,
+                include=["metadatas"]
+            )
+            top_ids = results["ids"][0]
+            if not top_ids or store.get(top_ids[0]) != chunks[i]["text"]:
+                raise RuntimeError(f"Smoke test failed: chunk {i} is not its own top match")
+    finally:
+        store.close()
+
+
+def _discard_version(client, version: str):
+    try:
+        client.delete_collection(name=version)
+    except Exception:
+        pass
+    shutil.rmtree(store_path(version), ignore_errors=True)
@@ -0,0 +1,138 @@
+"""
+OpenTelemetry tracing for the agent, retrieval, LLM and file tools.
+
+Spans are no-ops until configure_tracing() installs an exporter, and
+everything degrades to no-ops when opentelemetry is not installed.
+
+    configure_tracing("console")            # print spans to stderr
+    configure_tracing("file:traces.jsonl")  # one JSON span per line
+"""
+
+import functools
+import json
+import sys
+import threading
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SpanExporter,
+        SpanExportResult,
+    )
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+SERVICE_NAME = "django_cli_agent"
+
+
+if OTEL_AVAILABLE:
+
+    class JsonLinesSpanExporter(SpanExporter):
+        """Append finished spans to a local file, one JSON object per line"""
+
+        def __init__(self, path: str):
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans):
+            try:
+                with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                    for span in spans:
+                        f.write(json.dumps(json.loads(span.to_json())) + "\n")
+            except OSError:
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+
+def configure_tracing(target: str | None) -> bool:
+    """
+    Install a tracer provider exporting to "console" or "file:PATH".
+
+    Returns:
+        True if tracing is now active
+    """
+    if not target:
+        return False
+    if not OTEL_AVAILABLE:
+        print("⚠️  Warning: opentelemetry-sdk is not installed; tracing disabled.", file=sys.stderr)
+        return False
+
+    if target == "console":
+        exporter = ConsoleSpanExporter(out=sys.stderr)
+    elif target.startswith("file:"):
+        exporter = JsonLinesSpanExporter(target[len("file:"):])
+    else:
+        raise ValueError(f"Unknown trace target: {target} (use 'console' or 'file:PATH')")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return True
+
+
+def shutdown_tracing():
+    """Flush pending spans (call before the process exits)"""
+    if OTEL_AVAILABLE:
+        provider = trace.get_tracer_provider()
+        if hasattr(provider, "shutdown"):
+            provider.shutdown()
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def set_attributes(current, attributes: dict):
+    """Set span attributes, skipping None values (OpenTelemetry rejects them)"""
+    current.set_attributes({k: v for k, v in attributes.items() if v is not None})
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Start a span as a child of the current one.
+
+    None-valued attributes are skipped (OpenTelemetry rejects them).
+    """
+    if not OTEL_AVAILABLE:
+        yield _NOOP_SPAN
+        return
+
+    tracer = trace.get_tracer(SERVICE_NAME)
+    with tracer.start_as_current_span(name) as current:
+        set_attributes(current, attributes)
+        yield current
+
+
+def traced(name: str):
+    """
+    Decorator wrapping a file tool call in a span; the first argument
+    is recorded as the file path.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            path = args[0] if args else kwargs.get("path")
+            with span(name, **{"file.path": path}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -14,6 +14,8 @@ sys.path.insert(0, str(project_root))
 
 import chromadb
 from rag.embeddings import embed_texts
+from rag.chunk_store import open_chunk_store
+from rag.index_versions import active_collection
 
 
 def verify_vector_db():
@@ -86,7 +88,9 @@ def verify_vector_db():
         # Test retrieval
         if len(collections) > 0:
             print("🧪 Testing retrieval...")
-            collection = client.get_collection("django_docs")
+            active = active_collection("django_docs")
+            print(f"   Active version: {active}")
+            collection = client.get_collection(active)
             
             test_query = "How to create Django models?"
             print(f"   Query: '{test_query}'")
@@ -97,11 +101,19 @@ def verify_vector_db():
                 n_results=3
             )
             
-            print(f"✅ Retrieved {len(results['documents'][0])} results")
+            print(f"✅ Retrieved {len(results['ids'][0])} results")
+
+            # Newer indexes keep chunk text in the compressed chunk store
+            chunk_store = open_chunk_store(active)
+            if chunk_store:
+                documents = chunk_store.get_many(results['ids'][0])
+                print(f"   Chunk store: {len(chunk_store)} chunks")
+            else:
+                documents = results['documents'][0]
             
-            if results['documents'][0]:
+            if documents:
                 print(f"\n📄 First result preview:")
-                print(f"   {results['documents'][0][0][:200]}...")
+                print(f"   {documents[0][:200]}...")
                 print(f"   Source: {results['metadatas'][0][0]['source']}")
         
         print("\n" + "="*60)